@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark of the browser-mode store clients.
+
+Starts benchmarks/browser_fixture_server.py in its own process, points
+BlinkitBrowser and SwiggyBrowser at it (BLINKIT_HOME_URL /
+SWIGGY_HOME_URL) and runs --ticks searches of --terms terms each
+through a real BrowserPool. Per store and tick it prints:
+
+- launch: Chromium start-up (first tick only)
+- tab:    borrowing a tab, including opening the home page when cold
+- TTFC:   time to first card, from pressing Enter until fresh cards render
+- per card: extraction time divided by the cards read
+- CDP:    browser round trips per search
+- RSS:    peak memory of this process plus its Chromium processes
+
+Needs Chromium for Playwright (`playwright install chromium`), no network.
+
+    python benchmarks/bench_browser.py [--stores blinkit,swiggy] [--ticks 5] [--terms 3] [--cards 300]
+                                       [--results-delay 0.3] [--asset-delay 0.2] [--json out.json]
+"""
+
+import os, sys, json, time, asyncio, argparse, subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from benchmarks.browser_fixture_server import add_arguments, STORES
+
+
+def _children():
+    """pid -> child pids, from /proc"""
+    tree = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        tree.setdefault(ppid, []).append(int(entry))
+    return tree
+
+
+def tree_rss_mb(root: int = None) -> float:
+    """Resident memory of `root` (default: this process) and all its descendants; Linux only"""
+    root = root or os.getpid()
+    if not os.path.isdir("/proc"):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 / 1024
+    tree, pending, total = _children(), [root], 0
+    page = os.sysconf("SC_PAGE_SIZE")
+    while pending:
+        pid = pending.pop()
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                total += int(f.read().split()[1]) * page
+        except OSError:
+            continue
+        pending.extend(tree.get(pid, ()))
+    return total / 1024 / 1024
+
+
+async def _sample_peak(peak: list, every: float = 0.1):
+    while True:
+        peak[0] = max(peak[0], tree_rss_mb())
+        await asyncio.sleep(every)
+
+
+def start_server(args):
+    cmd = [sys.executable, os.path.join(ROOT, "benchmarks", "browser_fixture_server.py"), f"--cards={args.cards}",
+           f"--results-delay={args.results_delay}", f"--asset-delay={args.asset_delay}"]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    urls = {}
+    while len(urls) < len(STORES):
+        line = proc.stdout.readline()
+        if not line:
+            raise RuntimeError(f"Fixture server exited with {proc.wait()}")
+        _, store, url = line.split()
+        urls[store] = url
+    return proc, urls
+
+
+async def bench_store(store: str, terms, ticks: int):
+    from stores.browser_pool import BrowserPool
+    from stores.blinkit_playwright import BlinkitBrowser
+    from stores.swiggy_playwright import SwiggyBrowser
+
+    pool = BrowserPool()
+    client = {"blinkit": BlinkitBrowser, "swiggy": SwiggyBrowser}[store]("400001", {}, pool)
+    rows = []
+    try:
+        for tick in range(ticks):
+            peak = [tree_rss_mb()]
+            sampler = asyncio.create_task(_sample_peak(peak))
+            started = time.monotonic()
+            try:
+                items = await client.search(terms)
+            except Exception:
+                # Every term fails when Chromium cannot start
+                if not pool.stats["launches"]:
+                    sys.exit("❌ Chromium did not start; install it with `playwright install chromium`")
+                raise
+            finally:
+                sampler.cancel()
+            elapsed = time.monotonic() - started
+
+            timings = [client.last_timings[t] for t in terms if t in client.last_timings]
+            cards = {t: sum(1 for i in items if i["term"] == t) for t in terms}
+            extract = [client.last_timings[t]["extract"] / cards[t] for t in terms if cards[t] and t in client.last_timings]
+            rows.append({
+                "store": store,
+                "tick": tick + 1,
+                "seconds": elapsed,
+                "launch": pool.last_launch_seconds if tick == 0 else 0.0,
+                "tab": max((t["tab"] for t in timings), default=0.0),
+                "ttfc": sum(t["results"] for t in timings) / len(timings) if timings else 0.0,
+                "extract_per_card": sum(extract) / len(extract) if extract else 0.0,
+                "cards": sum(cards.values()),
+                "cdp_calls": sum(t["cdp_calls"] for t in timings) / len(timings) if timings else 0.0,
+                "failed": len(terms) - len(timings),
+                "peak_rss_mb": max(peak[0], tree_rss_mb()),
+            })
+            client.last_timings.clear()
+    finally:
+        await pool.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stores", default=",".join(STORES), help="comma-separated, from: " + ", ".join(STORES))
+    parser.add_argument("--ticks", type=int, default=5)
+    parser.add_argument("--terms", type=int, default=3, help="terms per tick, searched in parallel tabs")
+    parser.add_argument("--json", help="save results to this file")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server, urls = start_server(args)
+    # Read at import time by the store modules
+    os.environ.update({f"{store.upper()}_HOME_URL": url for store, url in urls.items()})
+    os.environ["BROWSER_MAX_CARDS"] = str(args.cards)
+    import logging
+    logging.basicConfig(level=logging.WARNING)
+
+    terms = [f"bench term {i}" for i in range(args.terms)]
+    results = []
+    try:
+        print(f"{'store':<8} {'tick':>4} {'tick s':>7} {'launch':>7} {'tab':>6} {'TTFC':>6} "
+              f"{'per card':>9} {'cards':>6} {'CDP':>5} {'RSS MB':>7}")
+        for store in [s.strip() for s in args.stores.split(",") if s.strip()]:
+            for r in asyncio.run(bench_store(store, terms, args.ticks)):
+                results.append(r)
+                print(f"{r['store']:<8} {r['tick']:>4} {r['seconds']:>7.2f} {r['launch']:>7.2f} {r['tab']:>6.2f} "
+                      f"{r['ttfc']:>6.2f} {r['extract_per_card'] * 1e6:>7.0f}µs {r['cards']:>6} "
+                      f"{r['cdp_calls']:>5.1f} {r['peak_rss_mb']:>7.0f}" + (f"  ({r['failed']} failed)" if r["failed"] else ""))
+    finally:
+        server.terminate()
+        server.wait()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Coordinator/worker check against local mock stores, with Telegram faked.
+
+Starts benchmarks/mock_store_server.py, a coordinator and --workers
+`run.py worker` processes in a scratch directory, all sharing one
+CLUSTER_DB, then walks the cluster through the cases that move leases:
+
+1. start:  every (store, pincode, term) job is leased, loads differ by at most one
+2. crash:  a worker is killed with SIGKILL; its jobs move after CLUSTER_WORKER_TTL
+3. leave:  a worker stops with SIGINT; its jobs move right away
+4. join:   a new worker starts; it takes its share and no other job moves
+
+Each step prints how long the leases took to settle. At the end it checks
+that workers' results reached the coordinator and turned into alerts.
+Exits with status 1 if any check fails, e.g. in CI.
+
+    python benchmarks/bench_cluster.py [--workers 3] [--stores 3] [--terms 4] [--pincodes 2]
+                                       [--interval 2] [--heartbeat 0.5] [--ttl 2] [--keep] ...
+"""
+
+import os, sys, time, signal, sqlite3, argparse, tempfile, subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from benchmarks.mock_store_server import add_arguments
+from benchmarks.bench_ticks import start_server
+
+ALERTS_LOG = "alerts.log"
+
+
+class LoggingBot:
+    """Stands in for Telegram in the coordinator process: one line per message in ALERTS_LOG"""
+    async def send_message(self, chat_id, text, **kwargs):
+        with open(ALERTS_LOG, "a", encoding="utf-8") as f:
+            f.write(f"{chat_id} {text.splitlines()[0]}\n")
+
+
+def run_coordinator():
+    """Entry point of the coordinator process (--role coordinator)"""
+    import asyncio
+    from bot.cluster import Coordinator
+    coordinator = Coordinator()
+    coordinator.notifier.bot = LoggingBot()
+    try:
+        asyncio.run(coordinator.run())
+    except KeyboardInterrupt:
+        pass
+
+
+def _write_config(urls, terms, pincodes):
+    from stores.registry import BUILTIN_STORES
+    lines = ["stores:"]
+    for name, url in urls.items():
+        lines += [f"  - name: {name}", f"    url: \"{url}\""]
+    # Built-in stores are left out, including their browser fallback
+    lines += [f"  - name: {spec.name}\n    browser: \"\"" for spec in BUILTIN_STORES if spec.browser]
+    lines += ["subscriptions:", "  - chat_id: 1", "    terms:"]
+    lines += [f"      - \"cluster term {i}\"" for i in range(terms)]
+    lines += ["    pincodes:"] + [f"      - \"{400001 + i}\"" for i in range(pincodes)]
+    with open("config.yaml", "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return {spec.url_env: "" for spec in BUILTIN_STORES}
+
+
+class Cluster:
+    """The coordinator and worker processes of one run, with their logs in `workdir`"""
+    def __init__(self, workdir: str, env: dict):
+        self.workdir = workdir
+        self.env = env
+        self.coordinator = None
+        self.workers = {}  # name -> Popen
+        self.db = os.path.join(workdir, "cluster.db")
+
+    def _spawn(self, name, argv):
+        log = open(os.path.join(self.workdir, f"{name}.log"), "w", encoding="utf-8")
+        return subprocess.Popen([sys.executable, *argv], cwd=self.workdir, env=self.env, stdout=log, stderr=subprocess.STDOUT)
+
+    def start_coordinator(self):
+        self.coordinator = self._spawn("coordinator", [os.path.abspath(__file__), "--role=coordinator"])
+
+    def start_worker(self, name):
+        self.workers[name] = self._spawn(name, [os.path.join(ROOT, "run.py"), "worker"])
+        return self.workers[name].pid
+
+    def stop_worker(self, name, sig):
+        proc = self.workers.pop(name)
+        proc.send_signal(sig)
+        proc.wait()
+        return proc.pid
+
+    def leases(self):
+        """job -> worker id, {} until the coordinator created the tables"""
+        try:
+            conn = sqlite3.connect(self.db, timeout=5)
+            try:
+                return dict(conn.execute("SELECT job, worker FROM leases"))
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            return {}
+
+    def wait_for(self, check, timeout):
+        """Poll the lease table until check(leases) is true; (leases, seconds) or (leases, None) on timeout"""
+        started = time.monotonic()
+        leases = {}
+        while time.monotonic() - started < timeout:
+            leases = self.leases()
+            if check(leases):
+                return leases, time.monotonic() - started
+            time.sleep(0.1)
+        return leases, None
+
+    def stop(self):
+        for proc in [*self.workers.values(), self.coordinator]:
+            if proc is not None and proc.poll() is None:
+                proc.send_signal(signal.SIGINT)
+        for proc in [*self.workers.values(), self.coordinator]:
+            if proc is None:
+                continue
+            try:
+                proc.wait(10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+def _owners(pids):
+    """Lease check: every job held, only by workers with these pids, loads differ by at most one"""
+    pids = {str(p) for p in pids}
+
+    def check(leases, expected):
+        if len(leases) != expected:
+            return False
+        load = {}
+        for worker in leases.values():
+            load[worker.rsplit(":", 1)[-1]] = load.get(worker.rsplit(":", 1)[-1], 0) + 1
+        return set(load) == pids and max(load.values()) - min(load.values()) <= 1
+    return check
+
+
+def _spread(leases):
+    load = {}
+    for worker in leases.values():
+        load[worker] = load.get(worker, 0) + 1
+    return "/".join(str(n) for _, n in sorted(load.items())) or "none"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--role", choices=["coordinator"], help=argparse.SUPPRESS)
+    parser.add_argument("--workers", type=int, default=3, help="workers at the start (at least 3)")
+    parser.add_argument("--stores", type=int, default=3)
+    parser.add_argument("--terms", type=int, default=4)
+    parser.add_argument("--pincodes", type=int, default=2)
+    parser.add_argument("--interval", type=float, default=2, help="POLL_INTERVAL of every process")
+    parser.add_argument("--heartbeat", type=float, default=0.5, help="CLUSTER_HEARTBEAT")
+    parser.add_argument("--ttl", type=float, default=2, help="CLUSTER_WORKER_TTL")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds each step may take to settle")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directory with the process logs")
+    add_arguments(parser)
+    args = parser.parse_args()
+    if args.role == "coordinator":
+        return run_coordinator()
+    if args.workers < 3:
+        parser.error("--workers must be at least 3: one is killed and one leaves")
+
+    server, urls = start_server(args, args.stores)
+    workdir = tempfile.mkdtemp(prefix="bench_cluster_")
+    os.chdir(workdir)
+    env = {
+        **os.environ, **_write_config(urls, args.terms, args.pincodes),
+        "PYTHONPATH": ROOT, "TELEGRAM_BOT_TOKEN": "0:bench", "TELEGRAM_CHAT_ID": "1", "RUN_MODE": "api",
+        "METRICS_PORT": "0", "POLL_INTERVAL": str(args.interval), "CLUSTER_DB": os.path.join(workdir, "cluster.db"),
+        "CLUSTER_HEARTBEAT": str(args.heartbeat), "CLUSTER_WORKER_TTL": str(args.ttl), "CLUSTER_DRAIN_INTERVAL": "0.2",
+        "TELEGRAM_GLOBAL_RATE": "1000", "TELEGRAM_CHAT_RATE": "1000",
+    }
+    jobs = args.stores * args.terms * args.pincodes
+    cluster = Cluster(workdir, env)
+    failures = []
+
+    def step(name, pids, timeout):
+        leases, took = cluster.wait_for(lambda l: _owners(pids)(l, jobs), timeout)
+        if took is None:
+            failures.append(name)
+            print(f"❌ {name:<6} not settled after {timeout:g}s, leases {_spread(leases)}")
+        else:
+            print(f"✅ {name:<6} {len(pids)} worker(s), {jobs} jobs as {_spread(leases)} after {took:.1f}s")
+        return leases
+
+    try:
+        cluster.start_coordinator()
+        pids = [cluster.start_worker(f"worker{i}") for i in range(args.workers)]
+        step("start", pids, args.timeout)
+
+        pids.remove(cluster.stop_worker("worker0", signal.SIGKILL))
+        step("crash", pids, args.timeout + args.ttl)
+
+        pids.remove(cluster.stop_worker("worker1", signal.SIGINT))
+        before = step("leave", pids, args.timeout)
+
+        pids.append(cluster.start_worker("worker_new"))
+        after = step("join", pids, args.timeout)
+        moved = sum(1 for job, worker in after.items() if before.get(job) != worker)
+        share = -(-jobs // len(pids))
+        if "join" not in failures and moved > share:
+            failures.append("join")
+            print(f"❌ join   moved {moved} jobs, the new worker's share is at most {share}")
+
+        # Let the workers' first results reach the coordinator
+        time.sleep(args.interval + 1)
+    finally:
+        cluster.stop()
+        server.terminate()
+        server.wait()
+
+    alerts = 0
+    if os.path.exists(ALERTS_LOG):
+        with open(ALERTS_LOG, encoding="utf-8") as f:
+            alerts = sum(1 for line in f if "Restock Alert" in line)
+    if alerts:
+        print(f"✅ alerts {alerts} restock message(s) sent by the coordinator")
+    else:
+        failures.append("alerts")
+        print("❌ alerts none sent; results did not reach the coordinator")
+
+    os.chdir(ROOT)
+    if args.keep or failures:
+        print(f"Logs in {workdir}")
+    else:
+        import shutil
+        shutil.rmtree(workdir, ignore_errors=True)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of product extraction: the compiled StoreSpec extractor
+against the hand-written or-chain parser the store modules used before,
+and against walking the same field paths at run time.
+
+All run over the same decoded payloads (see bench_json.py for where
+they come from) and must produce identical products.
+
+    python benchmarks/bench_extract.py [dir ...] [--repeat N]
+"""
+
+import os, gc, sys, time, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from infra.json_codec import loads
+from stores.registry import StoreSpec, DEFAULT_PRODUCTS, DEFAULT_FIELDS
+from benchmarks.bench_json import load_payloads
+
+
+def legacy_parse_products(data):
+    """The per-store parser as it was copy-pasted across the *_api.py modules"""
+    results = []
+    products = data.get("products") or data.get("data") or data.get("items") or []
+    for p in products:
+        title = (p.get("name") or p.get("title") or "").strip()
+        if not title:
+            continue
+        in_stock = bool(p.get("in_stock") or p.get("available") or p.get("is_available") or (p.get("inventory", {}).get("available", False)))
+        price = p.get("price") or p.get("mrp") or p.get("final_price") or ""
+        pid = str(p.get("id") or p.get("sku") or title)
+        urlp = p.get("url") or p.get("product_url") or ""
+        results.append({"id": pid, "name": title, "price": price, "in_stock": in_stock, "url": urlp})
+    return results
+
+
+def _walk(obj, path):
+    for part in path.split("."):
+        obj = (obj or {}).get(part)
+    return obj
+
+
+def interpreted_parse_products(data, products=DEFAULT_PRODUCTS, fields=DEFAULT_FIELDS):
+    """What a declarative registry costs without compiling: the field paths are walked for every item"""
+    def first(obj, paths):
+        for path in paths:
+            value = _walk(obj, path)
+            if value:
+                return value
+        return None
+
+    results = []
+    for p in first(data, products) or ():
+        title = (first(p, fields["name"]) or "").strip()
+        if not title:
+            continue
+        results.append({
+            "id": str(first(p, fields["id"]) or title),
+            "name": title,
+            "price": first(p, fields["price"]) or "",
+            "in_stock": bool(first(p, fields["in_stock"])),
+            "url": first(p, fields["url"]) or "",
+        })
+    return results
+
+
+def bench(fns, data, repeat: int, rounds: int = 30):
+    """Best per-call time of each function, in seconds, over interleaved rounds with GC off"""
+    best = {name: float("inf") for name in fns}
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            for name, fn in fns.items():
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    fn(data)
+                best[name] = min(best[name], (time.perf_counter() - started) / repeat)
+    finally:
+        gc.enable()
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("dirs", nargs="*")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    dirs = args.dirs or [os.path.join(here, "payloads"), os.getenv("API_RECORD_DIR", "")]
+    fns = {
+        "legacy or-chains": legacy_parse_products,
+        "interpreted spec": interpreted_parse_products,
+        "compiled spec": StoreSpec("Benchmark").extract,
+    }
+
+    for label, body in load_payloads([d for d in dirs if d]).items():
+        data = loads(body)
+        expected = legacy_parse_products(data)
+        if any(fn(data) != expected for fn in fns.values()):
+            print(f"❌ {label}: extractors disagree with the legacy parser")
+            continue
+        if not expected:
+            print(f"⚠️  {label}: no products, skipped")
+            continue
+        times = bench(fns, data, args.repeat)
+        baseline = times["legacy or-chains"]
+        print(f"\n📦 {label}: {len(expected)} products")
+        for name, per_call in times.items():
+            print(f"   {name:<17} {per_call / len(expected) * 1e9:8.0f} ns/item  x{baseline / per_call:.2f}")
+
+
+if __name__ == "__main__":
+    main()
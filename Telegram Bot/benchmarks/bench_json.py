@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the JSON decoder backends on store API payloads.
+
+Decodes every payload with each installed backend straight from bytes,
+next to the old path (bytes -> str -> json.loads), and prints the time
+per decode and the speed-up. Payloads are the *.json files in the given
+directories (default: benchmarks/payloads and API_RECORD_DIR, which the
+API client fills with real responses); without any, a synthetic search
+response is used.
+
+    python benchmarks/bench_json.py [dir ...] [--repeat N]
+"""
+
+import os, sys, glob, json, time, random, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from infra.json_codec import BACKENDS, PREFERENCE
+
+
+def synthetic_payload(products=300, seed=1) -> bytes:
+    """A search response with the handful of fields we read buried among many we don't"""
+    rnd = random.Random(seed)
+    items = []
+    for i in range(products):
+        items.append({
+            "id": f"sku-{i}",
+            "name": f"Hot Wheels Car {i} " + "x" * rnd.randint(5, 40),
+            "price": rnd.randint(99, 2999),
+            "mrp": rnd.randint(99, 2999),
+            "available": rnd.random() < 0.5,
+            "url": f"/prn/hot-wheels-car-{i}/prid/{100000 + i}",
+            "images": [f"https://cdn.example.com/img/{i}/{k}.jpg" for k in range(6)],
+            "description": "Lorem ipsum dolor sit amet, " * rnd.randint(5, 20),
+            "variants": [{"id": f"v{i}-{k}", "size": k, "price": rnd.random() * 1000, "tags": ["a", "b", "c"]} for k in range(4)],
+            "ratings": {"avg": rnd.random() * 5, "count": rnd.randint(0, 10000), "histogram": [rnd.randint(0, 500) for _ in range(5)]},
+            "seller": {"name": "Seller", "id": rnd.randint(1, 100), "address": {"city": "Mumbai", "pincode": "400001"}},
+        })
+    return json.dumps({"products": items, "facets": [{"name": f"f{k}", "values": list(range(50))} for k in range(20)]}).encode()
+
+
+def load_payloads(dirs):
+    payloads = {}
+    for d in dirs:
+        for path in sorted(glob.glob(os.path.join(d, "*.json"))):
+            with open(path, "rb") as f:
+                payloads[os.path.basename(path)] = f.read()
+    return payloads or {"synthetic": synthetic_payload()}
+
+
+def bench(fn, data: bytes, repeat: int) -> float:
+    """Best of 5 runs, in seconds per decode"""
+    best = float("inf")
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            fn(data)
+        best = min(best, (time.perf_counter() - started) / repeat)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("dirs", nargs="*")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    dirs = args.dirs or [os.path.join(here, "payloads"), os.getenv("API_RECORD_DIR", "")]
+    payloads = load_payloads([d for d in dirs if d])
+
+    decoders = {"json (via str)": lambda b: json.loads(b.decode("utf-8"))}
+    for name in PREFERENCE:
+        try:
+            decoders[name] = BACKENDS[name]()
+        except ImportError:
+            print(f"⚠️  {name} not installed, skipped")
+
+    for label, data in payloads.items():
+        print(f"\n📦 {label}: {len(data) / 1024:.0f} KB")
+        baseline = None
+        for name, fn in decoders.items():
+            per_call = bench(fn, data, args.repeat)
+            baseline = baseline or per_call
+            print(
+                f"   {name:<15} {per_call * 1000:8.3f} ms  {len(data) / per_call / 1e6:8.1f} MB/s  "
+                f"x{baseline / per_call:.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
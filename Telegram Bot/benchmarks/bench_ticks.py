@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Load test of whole ticks against local mock stores, with Telegram faked.
+
+Starts benchmarks/mock_store_server.py in its own process and points
+store entries Mock1..MockN at it, then for every combination of
+--stores, --terms and --pincodes runs App.tick() --ticks times (after
+--warmup untimed ticks) in a fresh process. It reports ticks/s, CPU per
+tick, peak RSS, alerts and per-store request latency percentiles.
+
+    python benchmarks/bench_ticks.py [--stores 5,10] [--terms 1,10] [--pincodes 1,5] [--ticks 5]
+                                     [--latency lognormal:0.05,0.6] [--error-rate 0.02] [--flip-rate 0.05] ...
+
+--json saves the results; --baseline compares against a saved run and
+exits with status 1 when ticks/s, CPU per tick or peak RSS got worse by
+more than --tolerance, e.g. in CI before a deploy.
+"""
+
+import os, sys, json, time, asyncio, argparse, tempfile, subprocess, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from benchmarks.mock_store_server import add_arguments, server_argv
+
+
+def _ints(value: str):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def _peak_rss_mb() -> float:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+class FakeBot:
+    """Records messages instead of calling Telegram, optionally taking `delay` seconds per call"""
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.sent = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent += 1
+
+
+def _write_config(urls, stores, terms, pincodes):
+    lines = ["stores:"]
+    for name in list(urls)[:stores]:
+        lines += [f"  - name: {name}", f"    url: \"{urls[name]}\""]
+    lines += ["subscriptions:", "  - chat_id: 1", "    terms:"]
+    lines += [f"      - \"bench term {i}\"" for i in range(terms)]
+    lines += ["    pincodes:"] + [f"      - \"{400001 + i}\"" for i in range(pincodes)]
+    with open("config.yaml", "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+async def _run_ticks(app, mock_names, ticks, warmup, telegram_delay):
+    from infra.latency import LatencyTracker
+    from infra.metrics import CHECK_ERRORS
+
+    # Only the mock stores; built-in stores configured in .env are left alone
+    app.clients = [c for c in app.clients if c[0] in mock_names]
+    for _, _, client in app.clients:
+        client.client.latency = LatencyTracker(window=1_000_000)
+    bot = FakeBot(telegram_delay)
+    app.notifier.bot = bot
+    await app.notifier.start()
+    try:
+        run_started = time.perf_counter()
+        for _ in range(warmup):
+            await app.tick()
+        started, cpu_started = time.perf_counter(), time.process_time()
+        for _ in range(ticks):
+            await app.tick()
+        elapsed, cpu = time.perf_counter() - started, time.process_time() - cpu_started
+        await app.notifier.stop()
+        total = time.perf_counter() - run_started
+    finally:
+        await app.http.close()
+        app.stock.close()
+
+    per_store = {}
+    for name, _, client in app.clients:
+        merged = per_store.setdefault(name, {"latency": LatencyTracker(window=1_000_000), "requests": 0, "retries": 0})
+        merged["latency"].samples.extend(client.client.latency.samples)
+        merged["requests"] += client.client.stats["requests"]
+        merged["retries"] += client.client.stats["retries"]
+    return {
+        "ticks": ticks,
+        "seconds": elapsed,
+        "ticks_per_sec": ticks / elapsed if elapsed else 0.0,
+        "cpu_ms_per_tick": cpu / ticks * 1000 if ticks else 0.0,
+        "alerts": bot.sent,
+        "alerts_per_sec": bot.sent / total if total else 0.0,
+        "failed_checks": CHECK_ERRORS.value(),
+        "stores": {
+            name: {"requests": s["requests"], "retries": s["retries"], **s["latency"].snapshot()}
+            for name, s in per_store.items()
+        },
+    }
+
+
+def run_case(urls, stores, terms, pincodes, ticks, warmup, telegram_rate, telegram_delay):
+    """One combination in a fresh process, so settings, caches and peak RSS start clean"""
+    workdir = tempfile.TemporaryDirectory(prefix="bench_ticks_")
+    os.chdir(workdir.name)
+    rate = str(telegram_rate or 1_000_000)
+    os.environ.update({
+        "TELEGRAM_BOT_TOKEN": "0:bench", "TELEGRAM_CHAT_ID": "1", "RUN_MODE": "api", "METRICS_PORT": "0",
+        "TELEGRAM_GLOBAL_RATE": rate, "TELEGRAM_CHAT_RATE": rate, "TELEGRAM_GROUP_RATE": rate,
+    })
+    _write_config(urls, stores, terms, pincodes)
+
+    import logging
+    from bot.app import App
+    logging.getLogger().setLevel(logging.WARNING)
+
+    try:
+        app = App()
+        result = asyncio.run(_run_ticks(app, set(list(urls)[:stores]), ticks, warmup, telegram_delay))
+    finally:
+        os.chdir(ROOT)
+        workdir.cleanup()
+    queries = stores * terms * pincodes
+    result.update(stores_count=stores, terms=terms, pincodes=pincodes, queries_per_tick=queries,
+                  checks_per_sec=queries * result["ticks_per_sec"], peak_rss_mb=_peak_rss_mb())
+    return result
+
+
+def start_server(args, stores):
+    cmd = [sys.executable, os.path.join(ROOT, "benchmarks", "mock_store_server.py"), f"--stores={stores}", *server_argv(args)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    urls = {}
+    while len(urls) < stores:
+        line = proc.stdout.readline()
+        if not line:
+            raise RuntimeError(f"Mock store server exited with {proc.wait()}")
+        _, name, url = line.split()
+        urls[name] = url
+    return proc, urls
+
+
+def _case_key(r):
+    return f"{r['stores_count']}x{r['terms']}x{r['pincodes']}"
+
+
+def compare(results, baseline, tolerance):
+    """(lines describing every metric worse than `baseline` by more than `tolerance`, cases compared)"""
+    before = {_case_key(r): r for r in baseline}
+    worse, compared = [], 0
+    for r in results:
+        old = before.get(_case_key(r))
+        if old is None:
+            continue
+        compared += 1
+        if r["ticks_per_sec"] < old["ticks_per_sec"] * (1 - tolerance):
+            worse.append(f"{_case_key(r)}: ticks/s {old['ticks_per_sec']:.2f} -> {r['ticks_per_sec']:.2f}")
+        if r["cpu_ms_per_tick"] > old["cpu_ms_per_tick"] * (1 + tolerance):
+            worse.append(f"{_case_key(r)}: CPU/tick {old['cpu_ms_per_tick']:.1f} -> {r['cpu_ms_per_tick']:.1f} ms")
+        if r["peak_rss_mb"] > old["peak_rss_mb"] * (1 + tolerance):
+            worse.append(f"{_case_key(r)}: peak RSS {old['peak_rss_mb']:.0f} -> {r['peak_rss_mb']:.0f} MB")
+    return worse, compared
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stores", type=_ints, default=[5], help="comma-separated store counts")
+    parser.add_argument("--terms", type=_ints, default=[1, 10], help="comma-separated term counts")
+    parser.add_argument("--pincodes", type=_ints, default=[1, 5], help="comma-separated pincode counts")
+    parser.add_argument("--ticks", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1, help="untimed ticks first (the first parses every body)")
+    parser.add_argument("--telegram-rate", type=float, default=0, help="messages/s per chat (default: no limit)")
+    parser.add_argument("--telegram-latency", type=float, default=0.0, help="seconds per fake Telegram call")
+    parser.add_argument("--json", help="save results to this file")
+    parser.add_argument("--baseline", help="results saved with --json to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server, urls = start_server(args, max(args.stores))
+    results = []
+    try:
+        spawn = multiprocessing.get_context("spawn")
+        print(f"{'stores':>6} {'terms':>5} {'pins':>4} {'queries':>7} {'ticks/s':>8} {'checks/s':>8} "
+              f"{'CPU/tick':>9} {'RSS MB':>7} {'alerts':>6} {'alerts/s':>8} {'failed':>6}")
+        for stores in args.stores:
+            for terms in args.terms:
+                for pincodes in args.pincodes:
+                    with ProcessPoolExecutor(1, mp_context=spawn) as pool:
+                        r = pool.submit(run_case, urls, stores, terms, pincodes, args.ticks, args.warmup,
+                                        args.telegram_rate, args.telegram_latency).result()
+                    results.append(r)
+                    print(f"{stores:>6} {terms:>5} {pincodes:>4} {r['queries_per_tick']:>7} {r['ticks_per_sec']:>8.2f} "
+                          f"{r['checks_per_sec']:>8.1f} {r['cpu_ms_per_tick']:>7.1f}ms {r['peak_rss_mb']:>7.0f} "
+                          f"{r['alerts']:>6} {r['alerts_per_sec']:>8.1f} {r['failed_checks']:>6.0f}")
+                    for name, s in r["stores"].items():
+                        print(f"{'':>20}{name:<8} requests={s['requests']:<5} retries={s['retries']:<4} "
+                              f"p50={s['p50'] * 1000:.0f}ms p90={s['p90'] * 1000:.0f}ms p99={s['p99'] * 1000:.0f}ms")
+    finally:
+        server.terminate()
+        server.wait()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            worse, compared = compare(results, json.load(f), args.tolerance)
+        for line in worse:
+            print(f"❌ {line}")
+        if worse:
+            sys.exit(1)
+        print(f"✅ {compared} case(s) within {args.tolerance:.0%} of {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Offline stand-in for the Blinkit and Swiggy web apps, for browser benchmarks.
+
+Serves benchmarks/fixtures/home.html at /<store>/ and, when the page's
+search box gets Enter, `--cards` copies of the store's saved product
+card (fixtures/<store>_card.html) from /<store>/results. Every third
+card is out of stock (no ADD button). Results wait `--results-delay`
+seconds and every asset (CSS, script, font, images) `--asset-delay`
+seconds, so blocking and waiting strategies show up in the timings.
+
+    python benchmarks/browser_fixture_server.py [--cards 300] [--results-delay 0.3] [--asset-delay 0.2] [--port P]
+
+Prints "ready <store> <home url>" per store once listening.
+"""
+
+import os, asyncio, argparse
+from aiohttp import web
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+STORES = ("blinkit", "swiggy")
+
+_ASSET_TYPES = {".css": "text/css", ".js": "application/javascript", ".woff2": "font/woff2",
+                ".png": "image/png", ".jpg": "image/jpeg", ".webp": "image/webp"}
+_ADD_BUTTON = '<button class="add-btn" type="button">ADD</button>'
+_SOLD_OUT = '<div class="sold-out">Out of Stock</div>'
+
+
+def _read(name: str) -> str:
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def _fill(template: str, **values) -> str:
+    for key, value in values.items():
+        template = template.replace("{{" + key + "}}", str(value))
+    return template
+
+
+def render_cards(template: str, term: str, count: int) -> str:
+    """`count` cards from one saved card, titled after the search term"""
+    cards = []
+    for i in range(count):
+        title = f"{term.title()} item {i}"
+        cards.append(_fill(
+            template, id=100000 + i, slug=f"{term.replace(' ', '-')}-item-{i}", title=title,
+            price=99 + i % 500, mrp=149 + i % 500, action=_SOLD_OUT if i % 3 == 2 else _ADD_BUTTON,
+        ))
+    return "\n".join(cards)
+
+
+class BrowserFixtureServer:
+    def __init__(self, cards: int = 300, results_delay: float = 0.3, asset_delay: float = 0.2,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.cards = cards
+        self.results_delay = results_delay
+        self.asset_delay = asset_delay
+        self.host = host
+        self.port = port
+        self.home = _read("home.html")
+        self.card_templates = {store: _read(f"{store}_card.html") for store in STORES}
+        self.stats = {"pages": 0, "results": 0, "assets": 0}
+        self.urls = {}
+        self._runner = None
+
+    async def _home(self, request):
+        store = request.match_info["store"]
+        if store not in self.card_templates:
+            raise web.HTTPNotFound()
+        self.stats["pages"] += 1
+        return web.Response(text=_fill(self.home, store=store.title()), content_type="text/html")
+
+    async def _results(self, request):
+        store = request.match_info["store"]
+        if store not in self.card_templates:
+            raise web.HTTPNotFound()
+        self.stats["results"] += 1
+        await asyncio.sleep(self.results_delay)
+        html = render_cards(self.card_templates[store], request.query.get("q", ""), self.cards)
+        return web.Response(text=html, content_type="text/html")
+
+    async def _asset(self, request):
+        self.stats["assets"] += 1
+        await asyncio.sleep(self.asset_delay)
+        ext = os.path.splitext(request.match_info["name"])[1]
+        return web.Response(body=b" " * 2048, content_type=_ASSET_TYPES.get(ext, "application/octet-stream"))
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/assets/{name:.+}", self._asset)
+        app.router.add_get("/{store}/", self._home)
+        app.router.add_get("/{store}/results", self._results)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        port = self._runner.addresses[0][1]
+        self.urls = {store: f"http://{self.host}:{port}/{store}/" for store in STORES}
+        return self.urls
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def add_arguments(parser):
+    """Server options shared with bench_browser.py, which passes them through"""
+    parser.add_argument("--cards", type=int, default=300, help="product cards per results page")
+    parser.add_argument("--results-delay", type=float, default=0.3, help="seconds before results are returned")
+    parser.add_argument("--asset-delay", type=float, default=0.2, help="seconds before each asset is returned")
+
+
+async def serve(server: BrowserFixtureServer):
+    for store, url in (await server.start()).items():
+        print(f"ready {store} {url}", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=0, help="default: any free port")
+    add_arguments(parser)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(BrowserFixtureServer(args.cards, args.results_delay, args.asset_delay, port=args.port)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
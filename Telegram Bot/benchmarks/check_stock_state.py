@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Offline check of StockStateRepo's alert and stock-state logic.
+
+Plays short sequences of check results through a scratch DB and compares
+the alerts and stored state with what they should be:
+
+1. restock:  one alert per chat per in-stock spell, none while it stays in stock
+2. drop:     a price-drop alert once the price falls by PRICE_DROP_PERCENT
+3. unlisted: a product drops out of stock once no term that listed it does,
+             also when terms stop listing it one at a time
+4. empty:    a term with no results leaves its products alone
+5. v1:       products carried over from v1 seen keys do not alert again
+             while their first check lists them in stock, but do on their next restock
+
+Exits with status 1 if any check fails, e.g. in CI.
+
+    python benchmarks/check_stock_state.py
+"""
+
+import os, sys, sqlite3, tempfile, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from bot.repository import StockStateRepo, RESTOCK, PRICE_DROP
+
+STORE, PINCODE, CHAT = "mock", "400001", 1
+
+
+def item(pid, term, in_stock=True, price=100):
+    return {"id": pid, "term": term, "in_stock": in_stock, "price": price}
+
+
+class Check:
+    """A scratch StockStateRepo with one chat subscribed to every term"""
+    def __init__(self, workdir, name):
+        self.repo = StockStateRepo(os.path.join(workdir, f"{name}.db"), price_drop=10)
+
+    def run(self, *items):
+        alerts, _ = self.repo.update(STORE, PINCODE, list(items), lambda term: [CHAT])
+        return [(kind, a_item["id"]) for _, kind, a_item, _ in alerts]
+
+    def state(self, pid):
+        states, _ = self.repo._scopes[f"{STORE}@{PINCODE}"]
+        return states[pid]
+
+
+def check_restock(workdir):
+    c = Check(workdir, "restock")
+    yield "first listing alerts", c.run(item("p", "a")) == [(RESTOCK, "p")]
+    yield "still in stock is quiet", c.run(item("p", "a"), item("p", "b")) == []
+    c.run(item("p", "a", in_stock=False))
+    yield "back in stock alerts again", c.run(item("p", "a")) == [(RESTOCK, "p")]
+
+
+def check_drop(workdir):
+    c = Check(workdir, "drop")
+    c.run(item("p", "a", price=100))
+    yield "small drop is quiet", c.run(item("p", "a", price=95)) == []
+    yield "drop past the threshold alerts", c.run(item("p", "a", price=89)) == [(PRICE_DROP, "p")]
+
+
+def check_unlisted(workdir):
+    c = Check(workdir, "unlisted")
+    c.run(item("p", "a"), item("p", "b"), item("q", "a"), item("q", "b"))
+    c.run(item("p", "b"), item("q", "a"), item("q", "b"))
+    p = c.state("p")
+    yield "one term still listing keeps it in stock", p.in_stock and p.terms == {"b"}
+    c.run(item("q", "a"), item("q", "b"))
+    p = c.state("p")
+    yield "no term listing it puts it out of stock", not p.in_stock and not p.terms and not p.alerted
+    yield "relisted alerts again", c.run(item("p", "a"), item("q", "a")) == [(RESTOCK, "p")]
+
+
+def check_empty(workdir):
+    c = Check(workdir, "empty")
+    c.run(item("p", "a"), item("q", "b"))
+    c.run(item("q", "b"))
+    yield "a term without results says nothing", c.state("p").in_stock
+
+
+def check_v1(workdir):
+    path = os.path.join(workdir, "v1.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE seen(key TEXT PRIMARY KEY, ts INTEGER)")
+    now = int(time.time())
+    conn.executemany("INSERT INTO seen VALUES (?, ?)", [(f"{CHAT}:{STORE}:{PINCODE}:{pid}", now) for pid in "pqr"])
+    conn.commit()
+    conn.close()
+    c = Check(workdir, "v1")
+    yield "v1 keys in stock do not alert again", c.run(item("p", "a"), item("q", "a", in_stock=False)) == []
+    yield "v1 key sold out alerts on its restock", c.run(item("p", "a"), item("q", "a")) == [(RESTOCK, "q")]
+    yield "v1 key missing from the first check alerts when listed", \
+        c.run(item("p", "a"), item("q", "a"), item("r", "a")) == [(RESTOCK, "r")]
+    c.run(item("q", "a"), item("r", "a"))
+    yield "v1 key is unlisted like any other", not c.state("p").in_stock and not c.state("p").alerted
+    yield "v1 key alerts on its next restock", c.run(item("p", "a"), item("q", "a")) == [(RESTOCK, "p")]
+
+
+def main():
+    failures = 0
+    with tempfile.TemporaryDirectory(prefix="check_stock_state_") as workdir:
+        for check in (check_restock, check_drop, check_unlisted, check_empty, check_v1):
+            for name, ok in check(workdir):
+                print(f"{'✅' if ok else '❌'} {check.__name__[6:]:<9} {name}")
+                failures += not ok
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for N store search APIs, for load tests.
+
+Store i listens on its own port (base port + i) so the bot's per-host
+connection limits apply as they would to real stores, and answers
+
+    GET /search?pincode={PINCODE}&q={QUERY}
+
+with `--products` items per query. Each request waits for a latency
+drawn from that store's distribution, fails with a 503 with probability
+`--error-rate`, and flips each product's stock state with probability
+`--flip-rate`. Bodies are rebuilt only after a flip, so unchanged
+responses are byte-identical as they are from a real API; `--etag` adds
+ETag / 304 handling.
+
+Latency distributions (seconds): fixed:0.05, uniform:0.01,0.2,
+exp:0.05 (mean) and lognormal:0.05,0.6 (median, sigma). Give
+`--latency` several times to cycle distributions over the stores.
+
+    python benchmarks/mock_store_server.py [--stores N] [--port P] [--latency lognormal:0.05,0.6] ...
+
+Prints one "ready <store> <url template>" line per store once listening.
+"""
+
+import sys, json, math, random, asyncio, hashlib, argparse
+from aiohttp import web
+
+
+def parse_latency(spec: str):
+    """Turn 'kind:a,b' into a function returning one latency sample"""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed":
+        return lambda rnd: values[0]
+    if kind == "uniform":
+        return lambda rnd: rnd.uniform(values[0], values[1])
+    if kind == "exp":
+        return lambda rnd: rnd.expovariate(1 / values[0])
+    if kind == "lognormal":
+        return lambda rnd: rnd.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Unknown latency distribution '{spec}', expected fixed, uniform, exp or lognormal")
+
+
+class MockStore:
+    """One store's endpoint: per (pincode, term) product list with stock states that drift"""
+    def __init__(self, name: str, latency: str, products: int, padding: int, error_rate: float,
+                 flip_rate: float, in_stock: float, etag: bool, seed: int):
+        self.name = name
+        self.latency = parse_latency(latency)
+        self.products = products
+        self.padding = "x" * padding
+        self.error_rate = error_rate
+        self.flip_rate = flip_rate
+        self.in_stock = in_stock
+        self.etag = etag
+        self.rnd = random.Random(seed)
+        self._queries = {}  # (pincode, term) -> [stock flags, body, etag]
+        self.stats = {"requests": 0, "errors": 0, "not_modified": 0, "flips": 0, "bytes": 0}
+
+    def _body(self, pincode, term, stock):
+        items = [
+            {
+                "id": f"{term}-{i}",
+                "name": f"{term.title()} {self.name} item {i}",
+                "price": 99 + i,
+                "available": flag,
+                "url": f"/p/{term.replace(' ', '-')}-{i}?pincode={pincode}",
+                "description": self.padding,
+            }
+            for i, flag in enumerate(stock)
+        ]
+        body = json.dumps({"products": items}).encode()
+        return body, hashlib.blake2b(body, digest_size=8).hexdigest()
+
+    def _query(self, pincode, term):
+        state = self._queries.get((pincode, term))
+        if state is None:
+            stock = [self.rnd.random() < self.in_stock for _ in range(self.products)]
+            state = self._queries[(pincode, term)] = [stock, *self._body(pincode, term, stock)]
+            return state
+        stock = state[0]
+        flipped = 0
+        for i in range(len(stock)):
+            if self.rnd.random() < self.flip_rate:
+                stock[i] = not stock[i]
+                flipped += 1
+        if flipped:
+            self.stats["flips"] += flipped
+            state[1:] = self._body(pincode, term, stock)
+        return state
+
+    async def handle(self, request):
+        self.stats["requests"] += 1
+        await asyncio.sleep(max(0.0, self.latency(self.rnd)))
+        if self.rnd.random() < self.error_rate:
+            self.stats["errors"] += 1
+            return web.Response(status=503, text="mock outage")
+        _, body, tag = self._query(request.query.get("pincode", ""), request.query.get("q", ""))
+        headers = {"Content-Type": "application/json"}
+        if self.etag:
+            headers["ETag"] = f'"{tag}"'
+            if request.headers.get("If-None-Match") == f'"{tag}"':
+                self.stats["not_modified"] += 1
+                return web.Response(status=304, headers=headers)
+        self.stats["bytes"] += len(body)
+        return web.Response(body=body, headers=headers)
+
+
+class MockStoreServer:
+    """Runs MockStores on consecutive ports of 127.0.0.1 (port 0 = pick free ones)"""
+    def __init__(self, stores: int = 5, port: int = 0, latency=("lognormal:0.05,0.6",), products: int = 30,
+                 padding: int = 200, error_rate: float = 0.0, flip_rate: float = 0.01, in_stock: float = 0.3,
+                 etag: bool = False, seed: int = 1):
+        self.port = port
+        self.stores = [
+            MockStore(f"Mock{i + 1}", latency[i % len(latency)], products, padding, error_rate,
+                      flip_rate, in_stock, etag, seed + i)
+            for i in range(stores)
+        ]
+        self.urls = {}
+        self._runners = []
+
+    async def start(self):
+        for i, store in enumerate(self.stores):
+            app = web.Application()
+            app.router.add_get("/search", store.handle)
+            runner = web.AppRunner(app, access_log=None)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", self.port + i if self.port else 0)
+            await site.start()
+            port = runner.addresses[0][1]
+            self.urls[store.name] = f"http://127.0.0.1:{port}/search?pincode={{PINCODE}}&q={{QUERY}}"
+            self._runners.append(runner)
+        return self.urls
+
+    def stats(self):
+        return {store.name: dict(store.stats) for store in self.stores}
+
+    async def stop(self):
+        for runner in self._runners:
+            await runner.cleanup()
+        self._runners = []
+
+
+def add_arguments(parser):
+    """Server options shared with bench_ticks.py, which passes them through"""
+    parser.add_argument("--latency", action="append", help="distribution per store, cycled (default lognormal:0.05,0.6)")
+    parser.add_argument("--products", type=int, default=30, help="items per response")
+    parser.add_argument("--padding", type=int, default=200, help="filler bytes per item, to set the payload size")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 503")
+    parser.add_argument("--flip-rate", type=float, default=0.01, help="chance per request that an item's stock flips")
+    parser.add_argument("--in-stock", type=float, default=0.3, help="share of items in stock at first")
+    parser.add_argument("--etag", action="store_true", help="send ETags and answer If-None-Match with 304")
+    parser.add_argument("--seed", type=int, default=1)
+
+
+def server_argv(args):
+    """`args` back as a command line for this script"""
+    argv = [f"--latency={spec}" for spec in args.latency or ()]
+    for name in ("products", "padding", "error_rate", "flip_rate", "in_stock", "seed"):
+        argv.append(f"--{name.replace('_', '-')}={getattr(args, name)}")
+    return argv + (["--etag"] if args.etag else [])
+
+
+def from_args(args, stores: int, port: int = 0) -> MockStoreServer:
+    return MockStoreServer(stores, port, args.latency or ["lognormal:0.05,0.6"], args.products, args.padding,
+                           args.error_rate, args.flip_rate, args.in_stock, args.etag, args.seed)
+
+
+async def serve(server: MockStoreServer):
+    urls = await server.start()
+    for name, url in urls.items():
+        print(f"ready {name} {url}", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        print(json.dumps(server.stats()), file=sys.stderr, flush=True)
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stores", type=int, default=5)
+    parser.add_argument("--port", type=int, default=0, help="first store's port (default: any free port)")
+    add_arguments(parser)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(from_args(args, args.stores, args.port)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,114 +1,281 @@
-import os, yaml, asyncio
+import os, yaml, asyncio, time
+from itertools import zip_longest
 from dotenv import load_dotenv
 load_dotenv()
 from infra.logging import setup_logging
+from infra.http import HttpSession
+from infra import json_codec
+from infra.circuit_breaker import CircuitBreaker
+from infra.metrics import MetricsServer, TICK_SECONDS, CHECK_SECONDS, CHECK_ERRORS
 logger = setup_logging()
 
 from bot.notifier import Notifier
-from bot.repository import SeenRepo
+from bot.repository import StockStateRepo, PRICE_DROP
 from bot.scheduler import Scheduler
+from bot.subscriptions import load_subscriptions, QueryPlan
 
-from stores.blinkit_api import BlinkitAPI
-from stores.swiggy_api import SwiggyAPI
-from stores.zepto_api import ZeptoAPI
-from stores.jiomart_api import JioMartAPI
-from stores.bigbasket_api import BigBasketAPI
+from stores.registry import load_registry, APIStore
 from stores.blinkit_playwright import BlinkitBrowser
 from stores.swiggy_playwright import SwiggyBrowser
+from stores.browser_pool import BrowserPool
 
 RUN_MODE = os.getenv("RUN_MODE", "api").lower()
-PINCODE = os.getenv("PINCODE", "").strip()
 INTERVAL = int(os.getenv("POLL_INTERVAL", "300"))
-TERMS = [t.strip() for t in os.getenv("SEARCH_TERMS", "hot wheels").split(",") if t.strip()]
+STORE_CONCURRENCY = int(os.getenv("STORE_CONCURRENCY", "0"))  # 0 = poll every store at once
+STORE_TIMEOUT = float(os.getenv("STORE_TIMEOUT", "120"))
+
+# Browser clients a StoreSpec can fall back to by name
+BROWSER_CLIENTS = {"blinkit": BlinkitBrowser, "swiggy": SwiggyBrowser}
 
 class App:
     def __init__(self):
-        self.notifier = Notifier()
-        self.seen = SeenRepo()
+        self.notifier = self._open_notifier()
+        self.stock = self._open_stock()
+        self.http = HttpSession()
+        self.browsers = BrowserPool()
+        self.scheduler = None
+        self.metrics = MetricsServer()
+
+        self.stores = load_registry()
+
+        # Every chat's terms and pincodes collapse into one set of unique queries
+        self.subscriptions = load_subscriptions()
+        self.plan = QueryPlan(self.subscriptions)
         self.clients = []
-        self.stores_configured = 0
-
-        # Blinkit
-        blink = BlinkitAPI(PINCODE)
-        if RUN_MODE == "api" and blink.enabled():
-            self.clients.append(("Blinkit", blink))
-            self.stores_configured += 1
-        else:
-            self.clients.append(("Blinkit", BlinkitBrowser(PINCODE, {})))
-            self.stores_configured += 1
-
-        # Swiggy
-        sw = SwiggyAPI(PINCODE)
-        if RUN_MODE == "api" and sw.enabled():
-            self.clients.append(("Swiggy", sw))
-            self.stores_configured += 1
-        else:
-            self.clients.append(("Swiggy", SwiggyBrowser(PINCODE, {})))
-            self.stores_configured += 1
-
-        # Zepto
-        z = ZeptoAPI(PINCODE)
-        if RUN_MODE == "api" and z.enabled():
-            self.clients.append(("Zepto", z))
-            self.stores_configured += 1
-
-        # JioMart
-        j = JioMartAPI(PINCODE)
-        if RUN_MODE == "api" and j.enabled():
-            self.clients.append(("JioMart", j))
-            self.stores_configured += 1
-
-        # BigBasket
-        b = BigBasketAPI(PINCODE)
-        if RUN_MODE == "api" and b.enabled():
-            self.clients.append(("BigBasket", b))
-            self.stores_configured += 1
-
-        logger.info(f"Initialized with {len(self.clients)} stores, {self.stores_configured} configured")
-        logger.info(f"Monitoring terms: {TERMS}")
-        logger.info(f"Pincode: {PINCODE}")
+        for pincode in self.plan.pincodes:
+            self.clients.extend((name, pincode, client) for name, client in self._build_clients(pincode))
+        self.stores_configured = len(self.clients)
+        self.breakers = {(name, pincode): CircuitBreaker(f"{name}@{pincode}" if pincode else name)
+                         for name, pincode, _ in self.clients}
+
+        logger.info(f"Initialized with {len(self.clients)} store clients for {len(self.plan.pincodes)} pincode(s)")
+        logger.info(
+            f"{len(self.subscriptions)} subscription(s) -> {self.plan.query_count()} unique queries per store per tick"
+        )
+        for pincode in self.plan.pincodes:
+            logger.info(f"Pincode {pincode or '(none)'}: terms {self.plan.terms_for(pincode)}")
         logger.info(f"Poll interval: {INTERVAL} seconds")
+        logger.info(f"JSON decoder: {json_codec.backend}")
+        logger.info(f"Store concurrency: {STORE_CONCURRENCY or 'unlimited'}, per-store timeout: {STORE_TIMEOUT:g}s")
+
+    def _open_notifier(self):
+        return Notifier()
+
+    def _open_stock(self):
+        return StockStateRepo()
+
+    def _build_clients(self, pincode):
+        """Store clients for one pincode, all sharing the app's HTTP pool and browser"""
+        clients = []
+        for spec in self.stores:
+            api = APIStore(spec, pincode, self.http)
+            if RUN_MODE == "api" and api.enabled():
+                clients.append((spec.name, api))
+            elif spec.browser:
+                if spec.browser not in BROWSER_CLIENTS:
+                    raise ValueError(f"Store '{spec.name}': unknown browser client '{spec.browser}', expected one of {list(BROWSER_CLIENTS)}")
+                clients.append((spec.name, BROWSER_CLIENTS[spec.browser](pincode, {}, self.browsers)))
+        return clients
+
+    async def _check_store(self, name, pincode, client, terms):
+        """
+        Search one store, then compare its results with the stock state and
+        alert as soon as it finishes. Returns (hits, alerts, flipped), where
+        flipped counts known products whose stock state changed (used to
+        poll the term faster for a while). Failures are
+        re-raised so the scheduler can back off; the chat only hears about
+        a store when its circuit opens or closes.
+        """
+        store = f"{name}@{pincode}" if pincode else name
+        label = f"{store} '{terms[0]}'" if len(terms) == 1 else store
+        breaker = self.breakers[(name, pincode)]
+        if not breaker.allow():
+            logger.debug(f"{label}: skipped, circuit open for another {breaker.retry_in():.0f}s")
+            return 0, 0, 0
+
+        started = time.monotonic()
+        try:
+            items = await asyncio.wait_for(client.search(terms), STORE_TIMEOUT)
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception as e:
+            CHECK_ERRORS.inc(store=store, type=type(e).__name__)
+            reason = f"timed out after {STORE_TIMEOUT:g}s" if isinstance(e, asyncio.TimeoutError) else str(e)[:100]
+            logger.warning(f"{label}: {reason}")
+            if breaker.record_failure():
+                await self.notifier.send_error(
+                    f"{store} failed {breaker.failures} times in a row ({reason}), "
+                    f"pausing checks for {breaker.reset_timeout:g}s"
+                )
+            raise
+        if breaker.record_success():
+            await self.notifier.send_status(f"✅ <b>{store}</b> is responding again, checks resumed")
+
+        try:
+            hits = sum(1 for i in items if i.get("in_stock"))
+            new, flipped, outcome = await self._deliver(name, pincode, items)
+
+            CHECK_SECONDS.observe(time.monotonic() - started, store=store, term=terms[0] if len(terms) == 1 else "*")
+            logger.info(f"{label}: checked, hits={hits}, {outcome}, flipped={flipped}")
+            return hits, new, flipped
+
+        except Exception as e:
+            CHECK_ERRORS.inc(store=store, type=type(e).__name__)
+            logger.exception(f"Error checking {label}: {e}")
+            await self.notifier.send_error(f"Error checking {label}: {str(e)[:100]}")
+            raise
+
+    async def _deliver(self, name, pincode, items):
+        """
+        Update the stock state with one check's products and alert the
+        chats that asked for the ones that came back in stock or got
+        cheaper. Returns (alerts, flipped, outcome), outcome being a short
+        note for the check's log line.
+        """
+        def subscribers(term):
+            return self.plan.subscribers(pincode, term) if term else self.plan.chats_for(pincode)
+
+        alerts, flipped = self.stock.update(name, pincode, items, subscribers)
+
+        by_chat = {}
+        for chat_id, kind, item, previous in alerts:
+            if kind == PRICE_DROP:
+                item = {**item, "price": f"{item.get('price')} (was {previous:g})"}
+            by_chat.setdefault(chat_id, []).append(item)
+
+        for chat_id, fresh in by_chat.items():
+            shown = f"{name} ({pincode})" if self.plan.watches_several_pincodes(chat_id) else name
+            await self.notifier.send_products(shown, fresh, chat_id=chat_id)
+        return len(alerts), flipped, f"alerts={len(alerts)} for {len(by_chat)} chat(s)"
+
+    def _job(self, name, pincode, client, term):
+        """Scheduler job for one term on one store; returns True when stock flipped, to poll it faster for a while"""
+        async def run():
+            _, _, flipped = await self._check_store(name, pincode, client, [term])
+            return flipped > 0
+        return run
+
+    def _interval_for(self, name) -> float:
+        return float(os.getenv(f"{name.upper()}_POLL_INTERVAL", INTERVAL))
+
+    def jobs(self):
+        """
+        (key, fn, interval, offset) for every (store, pincode, term), each
+        store on its own period. A store's jobs take turns across pincodes
+        and are spread evenly over its period, and each store starts a
+        fraction of a slot after the previous one, so no two zones or
+        stores fire at the same instant.
+        """
+        jobs = []
+        by_store = {}
+        for name, pincode, client in self.clients:
+            by_store.setdefault(name, []).append([
+                (f"{name}@{pincode}:{term}" if pincode else f"{name}:{term}", self._job(name, pincode, client, term))
+                for term in self.plan.terms_for(pincode)
+            ])
+        for i, (name, per_pincode) in enumerate(by_store.items()):
+            # Round-robin over pincodes: term 1 of every zone, then term 2...
+            turns = [job for turn in zip_longest(*per_pincode) for job in turn if job is not None]
+            period = self._interval_for(name)
+            start = period / max(len(turns), 1) * i / len(by_store)
+            jobs.extend((key, fn, period, start + period * j / len(turns)) for j, (key, fn) in enumerate(turns))
+        return jobs
+
+    def build_scheduler(self) -> Scheduler:
+        """One job per (store, pincode, term) plus periodic housekeeping"""
+        scheduler = Scheduler(INTERVAL, concurrency=STORE_CONCURRENCY)
+        for key, fn, interval, offset in self.jobs():
+            scheduler.add(key, fn, interval, offset=offset)
+        scheduler.add("housekeeping", self.housekeeping, INTERVAL, offset=INTERVAL)
+        return scheduler
 
     async def tick(self):
-        """Check all stores for product availability"""
-        total_hits = 0
-        total_fresh = 0
-        
-        for name, client in self.clients:
-            try:
-                items = await client.search(TERMS)
-                hits = [i for i in items if i.get("in_stock")]
-                fresh = []
-                
-                for item in hits:
-                    key = f"{name}:{item['id']}"
-                    if not self.seen.already_seen(key):
-                        self.seen.mark_seen(key)
-                        fresh.append(item)
-                
-                if fresh:
-                    await self.notifier.send_products(name, fresh)
-                
-                total_hits += len(hits)
-                total_fresh += len(fresh)
-                logger.info(f"{name}: checked, hits={len(hits)}, new={len(fresh)}")
-                
-            except Exception as e:
-                logger.exception(f"Error checking {name}: {e}")
-                await self.notifier.send_error(f"Error checking {name}: {str(e)[:100]}")
+        """Check every store for every term once, concurrently"""
+        started = time.monotonic()
+        sem = asyncio.Semaphore(STORE_CONCURRENCY or max(len(self.clients), 1))
+
+        async def check(name, pincode, client):
+            async with sem:
+                try:
+                    return await self._check_store(name, pincode, client, self.plan.terms_for(pincode))
+                except Exception:
+                    return 0, 0, 0
+
+        results = await asyncio.gather(*(check(name, pincode, client) for name, pincode, client in self.clients))
+        total_fresh = sum(fresh for _, fresh, _ in results)
 
         if total_fresh > 0:
-            logger.info(f"Total new products found: {total_fresh}")
+            logger.info(f"Total alerts: {total_fresh}")
+        TICK_SECONDS.observe(time.monotonic() - started)
+        logger.info(f"Tick finished in {time.monotonic() - started:.1f}s")
+        await self.housekeeping()
+
+    async def housekeeping(self):
+        """Periodic digest flush and stats"""
+        # In digest mode everything found since the last flush (or window) goes out together
+        await self.notifier.flush_digest()
+        self._log_delivery_stats()
+        self._log_polling_stats()
+
+    def _log_delivery_stats(self):
+        state = self.stock.stats
+        logger.info(
+            f"Stock state: {self.stock.products()} products in memory, checked={state['checked']}, "
+            f"flips={state['flips']} ({state['unlisted']} unlisted), restock alerts={state['restocks']}, "
+            f"price drop alerts={state['price_drops']}"
+        )
+        sent = self.notifier.stats
+        logger.info(
+            f"Notifier: queue depth={self.notifier.queue_depth()}, sent={sent['sent']}, failed={sent['failed']}, "
+            f"dropped={sent['dropped']}, latency avg={self.notifier.latency['avg']:.2f}s max={self.notifier.latency['max']:.2f}s"
+        )
+
+    def _log_polling_stats(self):
+        stats = self.http.stats
+        logger.info(
+            f"HTTP pool: requests={stats['requests']}, new connections={stats['connections_created']}, "
+            f"reused={stats['connections_reused']} ({self.http.reuse_ratio():.0%})"
+        )
+        for name, pincode, client in self.clients:
+            api = getattr(client, "client", None)
+            if api is None or not api.stats["requests"]:
+                continue
+            fetched = api.stats
+            latency = api.latency.snapshot()
+            logger.info(
+                f"{name}@{pincode} fetch: requests={fetched['requests']}, not modified={fetched['not_modified']}, "
+                f"unchanged body={fetched['unchanged']}, parsed={fetched['parsed']} ({api.skip_rate():.0%} skipped), "
+                f"retries={fetched['retries']}, hedged={fetched['hedged']} (won {fetched['hedge_wins']}), "
+                f"p50={latency['p50'] * 1000:.0f}ms p90={latency['p90'] * 1000:.0f}ms p99={latency['p99'] * 1000:.0f}ms"
+            )
+        tripped = [f"{b.name} (probe in {b.retry_in():.0f}s)" for b in self.breakers.values() if b.state != "closed"]
+        if tripped:
+            logger.info(f"Circuits not closed: {', '.join(tripped)}")
+        if self.scheduler is not None:
+            jobs = self.scheduler.snapshot()
+            hot = [j["key"] for j in jobs if j["hot"]]
+            backing_off = [f"{j['key']} ({j['period']:g}s)" for j in jobs if j["failures"]]
+            upcoming = ", ".join(f"{j['key']} in {j['next_run_in']:.0f}s" for j in jobs[:3])
+            logger.info(f"Scheduler: {len(jobs)} jobs, load={self.scheduler.load():.2f} workers, next: {upcoming}")
+            if hot:
+                logger.info(f"Scheduler: polling fast: {', '.join(hot)}")
+            if backing_off:
+                logger.info(f"Scheduler: backing off: {', '.join(backing_off)}")
 
     async def run(self):
         """Run the bot with startup message"""
+        # Long-unlisted products are forgotten off the polling path
+        compactor = asyncio.create_task(self.stock.run_compaction())
         try:
-            # Send startup message
+            # Send startup message, then hand alerts to the background sender
             await self.notifier.send_startup_message()
+            await self.notifier.start()
+            await self.metrics.start()
             
             # Start the scheduler
-            scheduler = Scheduler(INTERVAL)
-            await scheduler.run_forever(self.tick)
+            self.scheduler = self.build_scheduler()
+            await self.scheduler.run_forever()
             
         except KeyboardInterrupt:
             logger.info("Bot stopped by user")
@@ -117,3 +284,10 @@ class App:
             logger.exception(f"Fatal error: {e}")
             await self.notifier.send_error(f"Fatal error: {str(e)[:200]}")
             raise
+        finally:
+            compactor.cancel()
+            await self.metrics.stop()
+            await self.notifier.stop()
+            await self.http.close()
+            await self.browsers.close()
+            self.stock.close()
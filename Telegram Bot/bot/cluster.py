@@ -0,0 +1,336 @@
+import os, json, time, socket, sqlite3, asyncio, logging
+from bot.app import App, INTERVAL, STORE_CONCURRENCY
+from bot.scheduler import Scheduler
+
+logger = logging.getLogger(__name__)
+
+CLUSTER_DB = os.getenv("CLUSTER_DB", "cluster.db")
+CLUSTER_HEARTBEAT = float(os.getenv("CLUSTER_HEARTBEAT", "5"))
+CLUSTER_WORKER_TTL = float(os.getenv("CLUSTER_WORKER_TTL", "20"))  # silent this long = dead, jobs move
+CLUSTER_DRAIN_INTERVAL = float(os.getenv("CLUSTER_DRAIN_INTERVAL", "1"))
+
+_DRAIN_BATCH = 200
+
+
+class LeaseStore:
+    """
+    SQLite state shared by the coordinator and its workers: which workers
+    are alive (heartbeats), which worker holds the lease on each
+    (store, pincode, term) job, and an outbox of results and messages
+    waiting for the coordinator. Times are wall clock, as they are
+    compared across processes.
+    """
+    def __init__(self, db_path=CLUSTER_DB):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS workers(id TEXT PRIMARY KEY, host TEXT, pid INTEGER, started REAL, heartbeat REAL)"
+            )
+            self.conn.execute("CREATE TABLE IF NOT EXISTS leases(job TEXT PRIMARY KEY, worker TEXT NOT NULL, granted REAL)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_leases_worker ON leases(worker)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS outbox(id INTEGER PRIMARY KEY AUTOINCREMENT, worker TEXT, kind TEXT, payload TEXT, created REAL)"
+            )
+
+    def register(self, worker_id: str):
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO workers(id, host, pid, started, heartbeat) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET started=excluded.started, heartbeat=excluded.heartbeat",
+                (worker_id, socket.gethostname(), os.getpid(), now, now),
+            )
+
+    def heartbeat(self, worker_id: str) -> bool:
+        """Renew the worker's leases; False if the coordinator already gave up on it"""
+        with self.conn:
+            cur = self.conn.execute("UPDATE workers SET heartbeat=? WHERE id=?", (time.time(), worker_id))
+        return cur.rowcount > 0
+
+    def leave(self, worker_id: str):
+        """Deregister on shutdown so the coordinator moves the jobs right away"""
+        with self.conn:
+            self.conn.execute("DELETE FROM leases WHERE worker=?", (worker_id,))
+            self.conn.execute("DELETE FROM workers WHERE id=?", (worker_id,))
+
+    def reap(self, ttl: float = CLUSTER_WORKER_TTL):
+        """Remove workers that missed heartbeats for `ttl` seconds; returns their ids"""
+        cutoff = time.time() - ttl
+        with self.conn:
+            dead = [r[0] for r in self.conn.execute("SELECT id FROM workers WHERE heartbeat < ?", (cutoff,))]
+            self.conn.executemany("DELETE FROM workers WHERE id=?", [(w,) for w in dead])
+        return dead
+
+    def live_workers(self):
+        return [r[0] for r in self.conn.execute("SELECT id FROM workers ORDER BY id")]
+
+    def leases(self):
+        return dict(self.conn.execute("SELECT job, worker FROM leases"))
+
+    def leased_to(self, worker_id: str):
+        return {r[0] for r in self.conn.execute("SELECT job FROM leases WHERE worker=?", (worker_id,))}
+
+    def set_leases(self, assignment: dict):
+        """Replace the lease table with `assignment` (job -> worker), keeping grant times of unchanged leases"""
+        current = self.leases()
+        now = time.time()
+        with self.conn:
+            self.conn.executemany("DELETE FROM leases WHERE job=?", [(j,) for j in current if j not in assignment])
+            self.conn.executemany(
+                "INSERT INTO leases(job, worker, granted) VALUES (?, ?, ?) "
+                "ON CONFLICT(job) DO UPDATE SET worker=excluded.worker, granted=excluded.granted",
+                [(job, worker, now) for job, worker in assignment.items() if current.get(job) != worker],
+            )
+
+    def push(self, worker_id: str, kind: str, payload: dict):
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO outbox(worker, kind, payload, created) VALUES (?, ?, ?, ?)",
+                (worker_id, kind, json.dumps(payload, ensure_ascii=False), time.time()),
+            )
+
+    def peek(self, limit: int = _DRAIN_BATCH):
+        """Up to `limit` outbox entries, oldest first, as (id, worker, kind, payload, created); they stay until ack()ed"""
+        rows = self.conn.execute(
+            "SELECT id, worker, kind, payload, created FROM outbox ORDER BY id LIMIT ?", (limit,)
+        ).fetchall()
+        return [(entry_id, worker, kind, json.loads(payload), created) for entry_id, worker, kind, payload, created in rows]
+
+    def ack(self, entry_ids):
+        """Delete outbox entries that were handled"""
+        if not entry_ids:
+            return
+        with self.conn:
+            self.conn.executemany("DELETE FROM outbox WHERE id=?", [(i,) for i in entry_ids])
+
+    def backlog(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+def partition(jobs, workers, current=None):
+    """
+    Assign every job to one of `workers` so loads differ by at most one.
+    Jobs stay with their current worker while it is alive and under its
+    share, so a worker joining or leaving only moves the jobs it must.
+    """
+    if not workers:
+        return {}
+    current = current or {}
+    base, extra = divmod(len(jobs), len(workers))
+    load = {w: 0 for w in workers}
+    assignment, orphans = {}, []
+    for job in jobs:
+        owner = current.get(job)
+        if owner in load and (load[owner] < base or (load[owner] == base and extra > 0)):
+            if load[owner] == base:
+                extra -= 1
+            load[owner] += 1
+            assignment[job] = owner
+        else:
+            orphans.append(job)
+    for job in orphans:
+        owner = min(workers, key=lambda w: (load[w], w))
+        load[owner] += 1
+        assignment[job] = owner
+    return assignment
+
+
+class OutboxNotifier:
+    """Stands in for Notifier on a worker: messages reach Telegram through the coordinator"""
+    def __init__(self, leases: LeaseStore, worker_id: str):
+        self.leases = leases
+        self.worker_id = worker_id
+
+    async def send(self, text: str):
+        self.leases.push(self.worker_id, "text", {"text": text})
+
+    async def send_status(self, text: str):
+        self.leases.push(self.worker_id, "text", {"text": text})
+
+    async def send_error(self, error_msg: str):
+        self.leases.push(self.worker_id, "error", {"text": f"[{self.worker_id}] {error_msg}"})
+
+
+class Worker(App):
+    """
+    Polls only the jobs leased to it and hands every checked product to
+    the coordinator, which keeps the stock state and sends the alerts. Has
+    no Telegram bot or stock state DB of its own; any number of workers can
+    run, on any host that can reach CLUSTER_DB.
+    """
+    def __init__(self, leases: LeaseStore = None, worker_id: str = None):
+        self.leases = leases or LeaseStore()
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        super().__init__()
+        self._all_jobs = {key: (fn, interval, offset) for key, fn, interval, offset in self.jobs()}
+        # (store, pincode, term) -> {product id: in stock} from that query's last results, to spot flips
+        self._last_results = {}
+
+    def _open_notifier(self):
+        return OutboxNotifier(self.leases, self.worker_id)
+
+    def _open_stock(self):
+        # Stock state is kept once, on the coordinator
+        return None
+
+    async def _deliver(self, name, pincode, items):
+        if not items:
+            return 0, 0, "nothing to send"
+        self.leases.push(self.worker_id, "items", {"store": name, "pincode": pincode, "items": items})
+        by_term = {}
+        for item in items:
+            by_term.setdefault(item.get("term", ""), {})[item["id"]] = bool(item.get("in_stock"))
+        flipped = 0
+        for term, stock in by_term.items():
+            # Replaced on every check, so this holds at most one result set per query
+            last = self._last_results.get((name, pincode, term), {})
+            flipped += sum(1 for pid, in_stock in stock.items() if last.get(pid, in_stock) != in_stock)
+            self._last_results[(name, pincode, term)] = stock
+        return 0, flipped, "sent to coordinator"
+
+    async def housekeeping(self):
+        self._log_polling_stats()
+
+    def sync_leases(self):
+        """Start polling newly leased jobs and stop polling jobs leased elsewhere"""
+        owned = self.leases.leased_to(self.worker_id)
+        running = set(self.scheduler.jobs) - {"housekeeping"}
+        for key in running - owned:
+            self.scheduler.remove(key)
+        added = 0
+        for key in owned - running:
+            if key not in self._all_jobs:
+                logger.warning(f"Leased job {key} is not in this worker's config, ignoring")
+                continue
+            fn, interval, offset = self._all_jobs[key]
+            self.scheduler.add(key, fn, interval, offset=offset)
+            added += 1
+        if added or running - owned:
+            logger.info(f"Worker {self.worker_id}: +{added} -{len(running - owned)} jobs, now polling {len(self.scheduler.jobs) - 1}")
+
+    async def _heartbeat(self):
+        """Renew the leases and follow rebalancing; raises if the worker cannot register again"""
+        while True:
+            try:
+                if not self.leases.heartbeat(self.worker_id):
+                    logger.warning(f"Worker {self.worker_id}: lease expired, registering again")
+                    try:
+                        self.leases.register(self.worker_id)
+                    except sqlite3.Error as e:
+                        raise RuntimeError(f"Worker {self.worker_id} could not register again: {e}") from e
+                self.sync_leases()
+            except sqlite3.Error as e:
+                logger.error(f"Worker {self.worker_id}: heartbeat failed, retrying: {e}")
+            await asyncio.sleep(CLUSTER_HEARTBEAT)
+
+    async def run(self):
+        self.leases.register(self.worker_id)
+        logger.info(f"Worker {self.worker_id} joined {self.leases.db_path}")
+        self.scheduler = Scheduler(INTERVAL, concurrency=STORE_CONCURRENCY)
+        self.scheduler.add("housekeeping", self.housekeeping, INTERVAL, offset=INTERVAL)
+        polling = asyncio.create_task(self.scheduler.run_forever())
+        beat = asyncio.create_task(self._heartbeat())
+        try:
+            # Neither returns normally; whichever fails first stops the worker
+            done, _ = await asyncio.wait({polling, beat}, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        finally:
+            polling.cancel()
+            beat.cancel()
+            await asyncio.gather(polling, beat, return_exceptions=True)
+            try:
+                self.leases.leave(self.worker_id)
+            except sqlite3.Error as e:
+                logger.error(f"Worker {self.worker_id}: could not deregister, the coordinator will time it out: {e}")
+            await self.http.close()
+            await self.browsers.close()
+            self.leases.close()
+
+
+class Coordinator(App):
+    """
+    Leases the (store, pincode, term) jobs out to the live workers,
+    rebalancing when one joins, leaves or stops heartbeating, and turns
+    their results into alerts through the single Notifier and stock state DB.
+    """
+    def __init__(self, leases: LeaseStore = None):
+        self.leases = leases or LeaseStore()
+        super().__init__()
+        self.job_keys = [key for key, *_ in self.jobs()]
+        self.workers = []
+
+    async def rebalance(self):
+        dead = self.leases.reap()
+        live = self.leases.live_workers()
+        current = self.leases.leases()
+        if live == self.workers and not dead and set(current) == set(self.job_keys) and set(current.values()) <= set(live):
+            return
+        assignment = partition(self.job_keys, live, current)
+        moved = sum(1 for job, worker in assignment.items() if current.get(job) != worker)
+        self.leases.set_leases(assignment)
+        self.workers = live
+        if dead:
+            logger.warning(f"Workers stopped heartbeating: {', '.join(dead)}")
+            await self.notifier.send_error(f"Worker(s) {', '.join(dead)} stopped responding, moved their jobs to {len(live)} live worker(s)")
+        if not live:
+            logger.warning(f"No live workers, {len(self.job_keys)} jobs waiting")
+        else:
+            logger.info(f"Leases: {len(self.job_keys)} jobs over {len(live)} worker(s), {moved} moved")
+
+    async def drain(self):
+        """Compare what the workers found with the stock state and send the alerts"""
+        handled = []
+        try:
+            for entry_id, worker, kind, payload, _ in self.leases.peek():
+                if kind == "items":
+                    new, _, outcome = await self._deliver(payload["store"], payload["pincode"], payload["items"])
+                    if new:
+                        logger.info(f"{payload['store']}@{payload['pincode']} via {worker}: {outcome}")
+                elif kind == "error":
+                    await self.notifier.send_error(payload["text"])
+                else:
+                    await self.notifier.send_status(payload["text"])
+                handled.append(entry_id)
+        finally:
+            # Entries after one that failed stay in the outbox for the next drain
+            self.leases.ack(handled)
+
+    async def housekeeping(self):
+        await self.notifier.flush_digest()
+        self._log_delivery_stats()
+        counts = {}
+        for worker in self.leases.leases().values():
+            counts[worker] = counts.get(worker, 0) + 1
+        logger.info(
+            f"Cluster: {len(self.workers)} worker(s), outbox backlog={self.leases.backlog()}, "
+            f"jobs per worker: {', '.join(f'{w}={n}' for w, n in sorted(counts.items())) or 'none'}"
+        )
+
+    async def run(self):
+        compactor = asyncio.create_task(self.stock.run_compaction())
+        try:
+            await self.notifier.send_startup_message()
+            await self.notifier.start()
+            await self.metrics.start()
+            logger.info(f"Coordinator for {len(self.job_keys)} jobs, leases in {self.leases.db_path}")
+            self.scheduler = Scheduler(INTERVAL, jitter=0)
+            self.scheduler.add("rebalance", self.rebalance, CLUSTER_HEARTBEAT)
+            self.scheduler.add("drain", self.drain, CLUSTER_DRAIN_INTERVAL)
+            self.scheduler.add("housekeeping", self.housekeeping, INTERVAL, offset=INTERVAL)
+            await self.scheduler.run_forever()
+        finally:
+            compactor.cancel()
+            await self.metrics.stop()
+            await self.notifier.stop()
+            await self.http.close()
+            await self.browsers.close()
+            self.stock.close()
+            self.leases.close()
@@ -1,40 +1,176 @@
 import os
+import html
+import time
+import random
+from datetime import timedelta
 from telegram import Bot
-from telegram.error import TelegramError
+from telegram.error import TelegramError, RetryAfter, TimedOut, NetworkError, BadRequest, Forbidden
 import asyncio
 import logging
+from infra.rate_limit import TokenBucket
+from infra.metrics import NOTIFY_QUEUE_DEPTH, NOTIFY_SEND_SECONDS, NOTIFY_MESSAGES
 
 logger = logging.getLogger(__name__)
 
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 
+# Telegram allows about 30 messages/s overall, 1/s per chat and 20/min per group
+GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))
+CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))
+GROUP_RATE = float(os.getenv("TELEGRAM_GROUP_RATE", str(20 / 60)))
+QUEUE_SIZE = int(os.getenv("NOTIFY_QUEUE_SIZE", "1000"))
+MAX_RETRIES = int(os.getenv("NOTIFY_MAX_RETRIES", "5"))
+DIGEST_MODE = os.getenv("DIGEST_MODE", "0").lower() in ("1", "true", "yes")
+DIGEST_WINDOW = float(os.getenv("DIGEST_WINDOW", "0"))  # seconds; 0 = one digest per tick
+MAX_MESSAGE_LEN = 4096
+
 class Notifier:
     def __init__(self):
         if not BOT_TOKEN or not CHAT_ID:
             raise RuntimeError("Please set TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID")
         self.bot = Bot(BOT_TOKEN)
         self.chat_id = int(CHAT_ID)
+        self._global_bucket = TokenBucket(GLOBAL_RATE, capacity=GLOBAL_RATE)
+        self._chat_buckets = {}
+        # One queue and sender per chat, so a slow or flood-limited chat only delays itself
+        self._queues = {}
+        self._senders = {}
+        self._depth = 0
+        self._idle = None
+        self._running = False
+        self.stats = {"queued": 0, "sent": 0, "failed": 0, "dropped": 0, "retries": 0}
+        self.latency = {"last": 0.0, "avg": 0.0, "max": 0.0}
+        self.digest = DIGEST_MODE
+        self.digest_window = DIGEST_WINDOW
+        self._pending = {}
+        self._pending_since = None
+        NOTIFY_QUEUE_DEPTH.set_function(self.queue_depth)
+        NOTIFY_MESSAGES.set_function(lambda: {(k,): v for k, v in self.stats.items() if k != "queued"})
 
-    async def send(self, text: str):
-        """Send a text message to Telegram"""
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            # Negative ids are groups and channels, which have the tighter limit
+            bucket = TokenBucket(GROUP_RATE if chat_id < 0 else CHAT_RATE)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def _deliver(self, chat_id: int, text: str) -> bool:
+        """Send one message within the rate limits, honoring RetryAfter and retrying transient errors"""
+        for attempt in range(MAX_RETRIES + 1):
+            await self._global_bucket.acquire()
+            await self._chat_bucket(chat_id).acquire()
+            try:
+                await self.bot.send_message(
+                    chat_id=chat_id,
+                    text=text,
+                    parse_mode='HTML',
+                    disable_web_page_preview=True
+                )
+                self.stats["sent"] += 1
+                logger.info(f"Message sent successfully: {text[:50]}...")
+                return True
+            except RetryAfter as e:
+                wait = e.retry_after.total_seconds() if isinstance(e.retry_after, timedelta) else float(e.retry_after)
+                logger.warning(f"Telegram flood limit hit, retrying in {wait:.0f}s")
+                delay = wait + 0.5
+            except (BadRequest, Forbidden) as e:
+                # Not transient (bad HTML, bot blocked...): retrying would fail the same way
+                logger.error(f"Failed to send Telegram message: {e}")
+                break
+            except (TimedOut, NetworkError) as e:
+                delay = min(2 ** attempt, 30) + random.uniform(0, 1)
+                logger.warning(f"Telegram send failed ({e}), retrying in {delay:.1f}s")
+            except TelegramError as e:
+                logger.error(f"Failed to send Telegram message: {e}")
+                break
+            except Exception as e:
+                logger.error(f"Unexpected error sending message: {e}")
+                break
+            if attempt < MAX_RETRIES:
+                self.stats["retries"] += 1
+                await asyncio.sleep(delay)
+        self.stats["failed"] += 1
+        return False
+
+    async def start(self):
+        """Start the background senders; from now on alerts are queued instead of sent inline"""
+        if self._running:
+            return
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._running = True
+
+    async def _run_queue(self, chat_id: int, queue: asyncio.Queue):
+        while True:
+            text, queued_at = await queue.get()
+            try:
+                await self._deliver(chat_id, text)
+                elapsed = time.monotonic() - queued_at
+                self.latency["last"] = elapsed
+                self.latency["avg"] = elapsed if self.latency["avg"] == 0 else 0.9 * self.latency["avg"] + 0.1 * elapsed
+                self.latency["max"] = max(self.latency["max"], elapsed)
+                NOTIFY_SEND_SECONDS.observe(elapsed)
+            except Exception as e:
+                logger.error(f"Notifier worker error: {e}")
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._idle.set()
+
+    def enqueue(self, text: str, chat_id: int = None) -> bool:
+        """Queue a message without waiting on Telegram; returns False if the queues are full"""
+        if self._depth >= QUEUE_SIZE:
+            self.stats["dropped"] += 1
+            logger.error(f"Notification queue full, dropping message: {text[:50]}...")
+            return False
+        chat_id = chat_id or self.chat_id
+        queue = self._queues.get(chat_id)
+        if queue is None:
+            queue = self._queues[chat_id] = asyncio.Queue()
+            self._senders[chat_id] = asyncio.create_task(self._run_queue(chat_id, queue))
+        queue.put_nowait((text, time.monotonic()))
+        self._depth += 1
+        self._idle.clear()
+        self.stats["queued"] += 1
+        return True
+
+    def queue_depth(self) -> int:
+        return self._depth
+
+    async def stop(self, timeout: float = 10):
+        """Give queued messages up to `timeout` seconds to go out, then stop the sender"""
+        await self.flush_digest(force=True)
+        if not self._running:
+            return
         try:
-            await self.bot.send_message(
-                chat_id=self.chat_id,
-                text=text,
-                parse_mode='HTML',
-                disable_web_page_preview=True
-            )
-            logger.info(f"Message sent successfully: {text[:50]}...")
-        except TelegramError as e:
-            logger.error(f"Failed to send Telegram message: {e}")
-        except Exception as e:
-            logger.error(f"Unexpected error sending message: {e}")
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Notifier stopped with {self.queue_depth()} messages still queued")
+        for sender in self._senders.values():
+            sender.cancel()
+        self._queues, self._senders, self._depth = {}, {}, 0
+        self._running = False
 
-    async def send_products(self, store: str, items):
-        """Send product availability notifications"""
+    async def _emit(self, text: str, chat_id: int = None):
+        """Queue the message when the sender is running, otherwise send it right away"""
+        if self._running:
+            self.enqueue(text, chat_id)
+        else:
+            await self._deliver(chat_id or self.chat_id, text)
+
+    async def send(self, text: str):
+        """Send a text message to Telegram and wait for it to go out"""
+        await self._deliver(self.chat_id, text)
+
+    async def send_products(self, store: str, items, chat_id: int = None):
+        """Send product availability notifications (or collect them into the digest in digest mode)"""
         if not items:
             return
+        if self.digest:
+            self.collect(store, items, chat_id)
+            return
         
         try:
             # Create a formatted message
@@ -60,14 +196,14 @@ class Notifier:
                 # Split into multiple messages
                 chunks = self._split_message(message, 4000)
                 for chunk in chunks:
-                    await self.send(chunk)
+                    await self._emit(chunk, chat_id)
             else:
-                await self.send(message)
+                await self._emit(message, chat_id)
                 
         except Exception as e:
             logger.error(f"Error formatting product message: {e}")
             # Fallback to simple message
-            await self.send(f"🔔 New products available on {store}")
+            await self._emit(f"🔔 New products available on {store}", chat_id)
 
     def _split_message(self, message: str, max_length: int):
         """Split a long message into chunks"""
@@ -87,9 +223,70 @@ class Notifier:
         
         return chunks
 
+    def collect(self, store: str, items, chat_id: int = None):
+        """Add fresh items to a chat's pending digest, grouped by product name across stores"""
+        if self._pending_since is None:
+            self._pending_since = time.monotonic()
+        pending = self._pending.setdefault(chat_id or self.chat_id, {})
+        for item in items:
+            name = (item.get("name") or "Unknown Product").strip()
+            key = " ".join(name.lower().split())
+            entry = pending.setdefault(key, {"name": name, "offers": {}})
+            # One offer per store; a later sighting in the same window replaces the earlier one
+            entry["offers"][store] = (item.get("price", ""), item.get("url", ""))
+
+    def _digest_block(self, entry) -> str:
+        name = entry["name"] if len(entry["name"]) <= 200 else entry["name"][:199] + "…"
+        lines = [f"• <b>{html.escape(name)}</b>"]
+        for store, (price, url) in entry["offers"].items():
+            line = f"  {html.escape(store)}"
+            if price:
+                line += f" - {html.escape(str(price))}"
+            if url:
+                line += f" · <a href=\"{html.escape(url, quote=True)}\">View</a>"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def _pack(self, header: str, blocks, max_length: int = MAX_MESSAGE_LEN):
+        """
+        Greedily pack self-contained HTML blocks into as few messages as
+        possible. Messages are only cut between blocks (or, for an oversized
+        block, between its lines), so a tag is never split across messages.
+        """
+        messages, current = [], header
+        room = max_length - len(header) - 2
+        for block in blocks:
+            pieces = [block] if len(block) <= room else block.split("\n")
+            for i, piece in enumerate(pieces):
+                if len(current) + len(piece) + 2 > max_length:
+                    messages.append(current)
+                    current = header
+                current += ("\n\n" if i == 0 else "\n") + piece
+        if current != header:
+            messages.append(current)
+        return messages
+
+    async def flush_digest(self, force: bool = False):
+        """Send the pending digest once its window has elapsed (every call when the window is 0)"""
+        if not self._pending:
+            return
+        if not force and self.digest_window and time.monotonic() - self._pending_since < self.digest_window:
+            return
+        pending, self._pending, self._pending_since = self._pending, {}, None
+        for chat_id, products in pending.items():
+            entries = sorted(products.values(), key=lambda e: -len(e["offers"]))
+            stores = {store for e in entries for store in e["offers"]}
+            header = f"🔔 <b>Restock Alert</b> ({len(entries)} products on {len(stores)} stores)"
+            for message in self._pack(header, [self._digest_block(e) for e in entries]):
+                await self._emit(message, chat_id)
+
+    async def send_status(self, text: str):
+        """Queue a status message for the default chat, without waiting on Telegram"""
+        await self._emit(text)
+
     async def send_error(self, error_msg: str):
         """Send error notifications"""
-        await self.send(f"⚠️ <b>Bot Error</b>\n{error_msg}")
+        await self._emit(f"⚠️ <b>Bot Error</b>\n{error_msg}")
 
     async def send_startup_message(self):
         """Send startup notification"""
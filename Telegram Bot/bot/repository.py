@@ -1,29 +1,320 @@
-import time, sqlite3, os
+import re, time, sqlite3, os, asyncio, logging
+from typing import Optional
+from infra.metrics import STATE_OP_SECONDS
 
-class SeenRepo:
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 2
+COMPACT_INTERVAL = int(os.getenv("SEEN_COMPACT_INTERVAL", "300"))
+COMPACT_CHUNK = int(os.getenv("SEEN_COMPACT_CHUNK", "500"))
+VACUUM_EVERY = int(os.getenv("SEEN_VACUUM_EVERY", "12"))  # compaction cycles between vacuums
+STOCK_STATE_TTL = int(os.getenv("STOCK_STATE_TTL", str(30 * 86400)))  # forget products not listed for this long
+PRICE_DROP_PERCENT = float(os.getenv("PRICE_DROP_PERCENT", "10"))  # 0 = no price-drop alerts
+
+RESTOCK, PRICE_DROP = "restock", "price_drop"
+
+_PRICE = re.compile(r"\d+(?:\.\d+)?")
+# v1 seen keys: "chat:store:pincode:id", or "store:id" from before subscriptions
+_V1_KEY = re.compile(r"(-?\d+):([^:]*):([^:]*):(.+)")
+_V1_TTL = 6 * 3600
+_UNSET = object()
+
+
+def parse_price(value) -> Optional[float]:
+    """Numeric price of an API number or a scraped string like '₹1,299'; None when there is none"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    match = _PRICE.search(str(value or "").replace(",", ""))
+    return float(match.group()) if match else None
+
+
+class _State:
+    """One product at one store and pincode"""
+    __slots__ = ("in_stock", "price", "changed", "checked", "terms", "alerted")
+
+    def __init__(self, in_stock, price, changed, checked, terms, alerted):
+        self.in_stock = in_stock
+        self.price = price
+        self.changed = changed
+        self.checked = checked
+        self.terms = terms  # terms whose last result listed it
+        self.alerted = alerted  # chat id -> reference price, for chats alerted since it came back in stock
+
+    def row(self, scope, pid):
+        return (scope, pid, int(self.in_stock), self.price, self.changed, self.checked, "\n".join(sorted(self.terms)))
+
+
+class StockStateRepo:
     """
-    Uses an on-disk SQLite DB to persist seen alerts across restarts.
+    Last known state of every product in an on-disk SQLite DB: one row per
+    store, pincode and product id with whether it is in stock, its price,
+    when that last changed and which search terms list it, plus one row
+    per chat that was alerted about it since it came back in stock.
+
+    A store and pincode's rows are read into memory the first time it is
+    checked; after that each check is in-memory comparisons and a few
+    batched writes. A chat is alerted once per in-stock spell, whichever
+    of its terms finds the product, and again when the price drops by at
+    least `price_drop` percent from the price it was last told about
+    (which follows rises, so a slow slide still alerts once it adds up).
+    A product drops out of stock when it sells out, or when every term
+    that listed it returns results without it; an empty or failed result
+    says nothing either way.
     """
-    def __init__(self, db_path="seen.db", ttl_seconds=6*3600):
+    def __init__(self, db_path="seen.db", ttl_seconds=STOCK_STATE_TTL, price_drop=PRICE_DROP_PERCENT):
         self.ttl = ttl_seconds
+        self.price_drop = price_drop
         self.db_path = db_path
-        init = not os.path.exists(db_path)
         self.conn = sqlite3.connect(db_path, check_same_thread=False)
-        if init:
-            self.conn.execute("CREATE TABLE seen(key TEXT PRIMARY KEY, ts INTEGER)")
-            self.conn.commit()
+        self._scopes = {}  # "store@pincode" -> ({product id: _State}, {term: product ids it listed})
+        self.stats = {"checked": 0, "restocks": 0, "price_drops": 0, "flips": 0, "unlisted": 0}
+        self._configure()
+        self._migrate()
 
-    def _purge(self):
-        cutoff = int(time.time()) - self.ttl
-        self.conn.execute("DELETE FROM seen WHERE ts < ?", (cutoff,))
-        self.conn.commit()
+    def _configure(self):
+        # WAL lets readers run alongside the single writer and turns most commits
+        # into sequential appends; NORMAL sync is durable enough for alert state.
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA cache_size=-8000")  # ~8 MB page cache
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        self.conn.execute("PRAGMA busy_timeout=5000")
 
-    def already_seen(self, key: str) -> bool:
-        self._purge()
-        r = self.conn.execute("SELECT 1 FROM seen WHERE key = ?", (key,)).fetchone()
-        return bool(r)
+    def _migrate(self):
+        """Bring an existing (or empty) DB up to SCHEMA_VERSION"""
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS stock(scope TEXT NOT NULL, id TEXT NOT NULL, in_stock INTEGER NOT NULL, "
+                "price REAL, changed INTEGER NOT NULL, checked INTEGER NOT NULL, terms TEXT NOT NULL DEFAULT '', "
+                "PRIMARY KEY(scope, id)) WITHOUT ROWID"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_stock_checked ON stock(checked)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS alerted(scope TEXT NOT NULL, id TEXT NOT NULL, chat_id INTEGER NOT NULL, "
+                "price REAL, PRIMARY KEY(scope, id, chat_id)) WITHOUT ROWID"
+            )
+            if self.conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='seen'").fetchone():
+                self._import_v1()
+                self.conn.execute("DROP TABLE seen")
+        # auto_vacuum only takes effect after a full VACUUM, which also runs outside a transaction
+        self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self.conn.execute("VACUUM")
+        self.conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        logger.info(f"Migrated {self.db_path} to schema v{SCHEMA_VERSION}")
 
-    def mark_seen(self, key: str):
+    def _import_v1(self):
+        """
+        Carry v1's live seen keys over as products already alerted to their
+        chat. v1 did not record which terms listed them, so they are stored
+        as out of stock and settled by the first check of their store and
+        pincode that returns results: listed in stock keeps the alert,
+        anything else clears it.
+        """
+        legacy_chat = os.getenv("TELEGRAM_CHAT_ID", "").strip()
+        legacy_pincode = os.getenv("PINCODE", "").strip()
+        stock, alerted = {}, []
+        for key, ts in self.conn.execute("SELECT key, ts FROM seen WHERE ts >= ?", (int(time.time()) - _V1_TTL,)):
+            match = _V1_KEY.fullmatch(key)
+            if match:
+                chat_id, store, pincode, pid = match.groups()
+            elif ":" in key and legacy_chat.lstrip("-").isdigit():
+                (store, pid), chat_id, pincode = key.split(":", 1), legacy_chat, legacy_pincode
+            else:
+                continue
+            scope = f"{store}@{pincode}"
+            stock[(scope, pid)] = max(ts, stock.get((scope, pid), 0))
+            alerted.append((scope, pid, int(chat_id)))
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO stock(scope, id, in_stock, price, changed, checked) VALUES (?, ?, 0, NULL, ?, ?)",
+            [(scope, pid, ts, ts) for (scope, pid), ts in stock.items()],
+        )
+        self.conn.executemany("INSERT OR IGNORE INTO alerted(scope, id, chat_id, price) VALUES (?, ?, ?, NULL)", alerted)
+        if stock:
+            logger.info(f"Kept {len(stock)} recently alerted products from the v1 seen keys")
+
+    @STATE_OP_SECONDS.time(op="load")
+    def _load(self, scope: str):
+        states, by_term = {}, {}
+        for pid, in_stock, price, changed, checked, terms in self.conn.execute(
+            "SELECT id, in_stock, price, changed, checked, terms FROM stock WHERE scope = ?", (scope,)
+        ):
+            terms = set(terms.split("\n")) if terms else set()
+            states[pid] = _State(bool(in_stock), price, changed, checked, terms, {})
+            for term in terms:
+                by_term.setdefault(term, set()).add(pid)
+        for pid, chat_id, price in self.conn.execute("SELECT id, chat_id, price FROM alerted WHERE scope = ?", (scope,)):
+            if pid in states:
+                states[pid].alerted[chat_id] = price
+        # Alerted products no term lists are v1 imports waiting for their first check
+        imported = {pid for pid, state in states.items() if state.alerted and not state.terms}
+        if imported:
+            by_term[None] = imported
+        self._scopes[scope] = (states, by_term)
+        return states, by_term
+
+    def _alert(self, state, chat_id, price):
+        """(alert kind or None, previous reference price) for one in-stock product and chat; updates the reference"""
+        if chat_id not in state.alerted:
+            state.alerted[chat_id] = price
+            return RESTOCK, None
+        reference = state.alerted[chat_id]
+        if price is None or price == reference:
+            return None, reference
+        if reference is None or price > reference:
+            state.alerted[chat_id] = price
+            return None, reference
+        if self.price_drop and price <= reference * (1 - self.price_drop / 100):
+            state.alerted[chat_id] = price
+            return PRICE_DROP, reference
+        return None, reference
+
+    @STATE_OP_SECONDS.time(op="update")
+    def update(self, store: str, pincode: str, items, subscribers):
+        """
+        Compare one check's products with the stored state and save the
+        changes. `subscribers(term)` lists the chats watching a term.
+        Returns (alerts, flipped): alerts as (chat id, kind, item,
+        previous reference price) tuples, and how many known products
+        changed stock state.
+        """
         now = int(time.time())
-        self.conn.execute("INSERT OR REPLACE INTO seen(key, ts) VALUES (?, ?)", (key, now))
-        self.conn.commit()
+        scope = f"{store}@{pincode}"
+        states, by_term = self._scopes.get(scope) or self._load(scope)
+
+        # The same product can come from several terms of one check
+        listed = {}
+        for item in items:
+            entry = listed.get(item["id"])
+            if entry is None:
+                listed[item["id"]] = (item, {item.get("term", "")})
+                continue
+            entry[1].add(item.get("term", ""))
+            if item.get("in_stock") and not entry[0].get("in_stock"):
+                listed[item["id"]] = (item, entry[1])
+
+        alerts, changed, cleared, notes = [], set(), set(), []
+        flipped = 0
+        for pid, (item, terms) in listed.items():
+            in_stock = bool(item.get("in_stock"))
+            price = parse_price(item.get("price"))
+            state = states.get(pid)
+            if state is None:
+                state = states[pid] = _State(False, price, now, now, set(), {})
+            elif state.in_stock != in_stock:
+                flipped += 1
+            if state.in_stock != in_stock:
+                state.in_stock, state.changed = in_stock, now
+            if not in_stock and state.alerted:
+                state.alerted.clear()
+                cleared.add(pid)
+            state.price = price if price is not None else state.price
+            state.checked = now
+            for term in terms - state.terms:
+                by_term.setdefault(term, set()).add(pid)
+            state.terms |= terms
+            changed.add(pid)
+            if not in_stock:
+                continue
+            chats = dict.fromkeys(c for term in sorted(terms) for c in subscribers(term))
+            for chat_id in chats:
+                before = state.alerted.get(chat_id, _UNSET)
+                kind, previous = self._alert(state, chat_id, price)
+                if state.alerted[chat_id] is not before:
+                    notes.append((scope, pid, chat_id, state.alerted[chat_id]))
+                if kind is not None:
+                    alerts.append((chat_id, kind, item, previous))
+                    self.stats["restocks" if kind == RESTOCK else "price_drops"] += 1
+
+        # A term whose results no longer list a product stops vouching for it;
+        # once no term lists it, it is out of stock. Terms with no results are skipped.
+        for term in {t for _, terms in listed.values() for t in terms}:
+            now_listed = {pid for pid, (_, terms) in listed.items() if term in terms}
+            gone = by_term.get(term, set()) - now_listed
+            for pid in gone:
+                state = states[pid]
+                state.terms.discard(term)
+                changed.add(pid)
+                if not state.terms and state.in_stock:
+                    state.in_stock, state.changed = False, now
+                    flipped += 1
+                    self.stats["unlisted"] += 1
+                    if state.alerted:
+                        state.alerted.clear()
+                        cleared.add(pid)
+            by_term[term] = now_listed
+        if listed:
+            for pid in by_term.pop(None, set()) - listed.keys():
+                if states[pid].alerted:
+                    states[pid].alerted.clear()
+                    cleared.add(pid)
+
+        self.stats["checked"] += len(listed)
+        self.stats["flips"] += flipped
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO stock(scope, id, in_stock, price, changed, checked, terms) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(scope, id) DO UPDATE SET in_stock=excluded.in_stock, price=excluded.price, "
+                "changed=excluded.changed, checked=excluded.checked, terms=excluded.terms",
+                [states[pid].row(scope, pid) for pid in changed],
+            )
+            self.conn.executemany("DELETE FROM alerted WHERE scope = ? AND id = ?", [(scope, pid) for pid in cleared])
+            self.conn.executemany(
+                "INSERT INTO alerted(scope, id, chat_id, price) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(scope, id, chat_id) DO UPDATE SET price=excluded.price",
+                notes,
+            )
+        return alerts, flipped
+
+    def products(self) -> int:
+        return sum(len(states) for states, _ in self._scopes.values())
+
+    @STATE_OP_SECONDS.time(op="compact")
+    def compact(self, limit: int = COMPACT_CHUNK) -> int:
+        """Delete at most `limit` products not listed for `ttl` seconds, oldest first, using the checked index"""
+        with self.conn:
+            rows = self.conn.execute(
+                "SELECT scope, id FROM stock WHERE checked < ? ORDER BY checked LIMIT ?",
+                (int(time.time()) - self.ttl, limit),
+            ).fetchall()
+            self.conn.executemany("DELETE FROM alerted WHERE scope = ? AND id = ?", rows)
+            self.conn.executemany("DELETE FROM stock WHERE scope = ? AND id = ?", rows)
+        if rows:
+            # Reloaded lazily, without the forgotten products
+            self._scopes.clear()
+        return len(rows)
+
+    @STATE_OP_SECONDS.time(op="vacuum")
+    def vacuum(self):
+        """Return free pages to the OS and fold the WAL back into the main file"""
+        self.conn.execute("PRAGMA incremental_vacuum")
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    async def run_compaction(self, interval=COMPACT_INTERVAL, chunk=COMPACT_CHUNK, vacuum_every=VACUUM_EVERY):
+        """Background task: forget long-unlisted products in bounded chunks, vacuuming every few cycles"""
+        cycles = 0
+        while True:
+            try:
+                total = 0
+                while True:
+                    deleted = self.compact(chunk)
+                    total += deleted
+                    if deleted < chunk:
+                        break
+                    await asyncio.sleep(0)  # let the polling loop in between chunks
+                cycles += 1
+                if vacuum_every and cycles % vacuum_every == 0:
+                    self.vacuum()
+                if total:
+                    logger.info(f"Forgot {total} products not listed for {self.ttl // 86400} days")
+            except sqlite3.Error as e:
+                logger.error(f"Stock state compaction failed: {e}")
+            await asyncio.sleep(interval)
+
+    def close(self):
+        try:
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            self.conn.close()
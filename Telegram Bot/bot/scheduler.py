@@ -1,13 +1,195 @@
-import asyncio
+import os, math, time, random, asyncio, logging
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_JITTER = float(os.getenv("SCHEDULER_JITTER", "0.1"))  # fraction of a job's period
+SCHEDULER_MAX_BACKOFF = float(os.getenv("SCHEDULER_MAX_BACKOFF", "3600"))
+HOT_POLL_INTERVAL = float(os.getenv("HOT_POLL_INTERVAL", "60"))
+HOT_POLL_FOR = float(os.getenv("HOT_POLL_FOR", "900"))
+
+
+class Job:
+    """One periodic unit of work, e.g. a single term on a single store"""
+    def __init__(self, key: str, fn, interval: float):
+        self.key = key
+        self.fn = fn
+        self.interval = interval
+        self.slot = 0.0       # current point on the job's fixed-rate clock
+        self.due = 0.0        # slot plus jitter, when the job actually fires
+        self.failures = 0
+        self.hot_until = 0.0
+        self.running = False
+        self.runs = 0
+        self.errors = 0
+        self.missed = 0
+        self.last_duration = 0.0
+        self.avg_duration = 0.0
+
+    def is_hot(self, now: float) -> bool:
+        return now < self.hot_until
+
+    def period(self, now: float, max_backoff: float = SCHEDULER_MAX_BACKOFF, hot_interval: float = HOT_POLL_INTERVAL) -> float:
+        """Backs off on repeated errors, tightens while the job is hot, else the base interval"""
+        if self.failures:
+            return min(self.interval * 2 ** self.failures, max(max_backoff, self.interval))
+        if self.is_hot(now):
+            return min(self.interval, hot_interval)
+        return self.interval
+
 
 class Scheduler:
-    def __init__(self, interval_seconds: int):
+    """
+    Runs each job on its own fixed-rate clock: the next slot is one period
+    after the previous slot, not after the run finished, so a slow run
+    doesn't push later runs back and slots that were missed entirely are
+    skipped rather than run in a burst. Every run fires a random fraction
+    (`jitter`) of the period after its slot so jobs sharing a period don't
+    stay in lockstep.
+
+    A job that raises is retried with exponential backoff; a job whose
+    function returns a truthy value (or that is passed to mark_hot) is
+    polled every `hot_interval` seconds for the next `hot_for` seconds.
+    snapshot() reports next-run times and the load of every job.
+    """
+    def __init__(self, interval_seconds: float, concurrency: int = 0, jitter: float = SCHEDULER_JITTER,
+                 max_backoff: float = SCHEDULER_MAX_BACKOFF, hot_interval: float = HOT_POLL_INTERVAL,
+                 hot_for: float = HOT_POLL_FOR):
         self.interval = interval_seconds
+        self.concurrency = concurrency
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        self.hot_interval = hot_interval
+        self.hot_for = hot_for
+        self.jobs = {}
+        self._wake = None
+        self._sem = None
+
+    def add(self, key: str, fn, interval: float = None, offset: float = 0.0):
+        """Schedule `fn` (an async callable) every `interval` seconds, first run `offset` seconds from now"""
+        job = Job(key, fn, interval or self.interval)
+        job.slot = time.monotonic() + offset
+        job.due = job.slot
+        self.jobs[key] = job
+        if self._wake is not None:
+            self._wake.set()
+        return job
+
+    def remove(self, key: str):
+        """Stop scheduling `key`; a run already in progress finishes but is not rescheduled"""
+        return self.jobs.pop(key, None)
+
+    def mark_hot(self, key: str):
+        """Poll `key` at the hot interval for a while, starting with its next slot"""
+        job = self.jobs.get(key)
+        if job is None:
+            return
+        now = time.monotonic()
+        was_hot = job.is_hot(now)
+        job.hot_until = now + self.hot_for
+        if not was_hot:
+            logger.info(f"{key}: stock flipped, polling every {job.period(now, self.max_backoff, self.hot_interval):g}s for {self.hot_for:g}s")
+            # Pull the next run forward instead of waiting out the old, longer period
+            job.slot = min(job.slot, now + self.hot_interval)
+            job.due = min(job.due, job.slot)
+            if self._wake is not None:
+                self._wake.set()
+
+    def _schedule_next(self, job, now):
+        period = job.period(now, self.max_backoff, self.hot_interval)
+        job.slot += period
+        if job.slot <= now:
+            skipped = math.ceil((now - job.slot) / period)
+            job.missed += skipped
+            job.slot += skipped * period
+            if job.slot <= now:
+                job.slot += period
+                job.missed += 1
+        job.due = job.slot + random.uniform(0, self.jitter * period)
+
+    async def _run(self, job):
+        started = time.monotonic()
+        try:
+            if self._sem is not None:
+                async with self._sem:
+                    result = await job.fn()
+            else:
+                result = await job.fn()
+            if job.failures:
+                logger.info(f"{job.key}: recovered after {job.failures} failed run(s)")
+            job.failures = 0
+            if result:
+                self.mark_hot(job.key)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            job.failures += 1
+            job.errors += 1
+            logger.warning(
+                f"{job.key}: run failed ({job.failures} in a row), next try in "
+                f"{job.period(time.monotonic(), self.max_backoff, self.hot_interval):g}s: {e}"
+            )
+        finally:
+            now = time.monotonic()
+            job.runs += 1
+            job.last_duration = now - started
+            job.avg_duration = job.last_duration if job.runs == 1 else 0.8 * job.avg_duration + 0.2 * job.last_duration
+            job.running = False
+            self._schedule_next(job, now)
+            if self._wake is not None:
+                self._wake.set()
+
+    def snapshot(self):
+        """Per-job schedule and load, soonest first. `load` is the share of one worker the job keeps busy."""
+        now = time.monotonic()
+        rows = []
+        for job in self.jobs.values():
+            period = job.period(now, self.max_backoff, self.hot_interval)
+            rows.append({
+                "key": job.key,
+                "period": period,
+                "next_run_in": max(0.0, job.due - now),
+                "running": job.running,
+                "hot": job.is_hot(now),
+                "failures": job.failures,
+                "runs": job.runs,
+                "errors": job.errors,
+                "missed": job.missed,
+                "avg_duration": job.avg_duration,
+                "load": job.avg_duration / period if period else 0.0,
+                "runs_per_hour": 3600 / period if period else 0.0,
+            })
+        return sorted(rows, key=lambda r: r["next_run_in"])
+
+    def load(self) -> float:
+        """Total busy workers the current schedule needs on average"""
+        return sum(row["load"] for row in self.snapshot())
+
+    async def run_forever(self, coro_fn=None):
+        """Run scheduled jobs until cancelled. `coro_fn` alone keeps the old single-job behaviour."""
+        if coro_fn is not None:
+            self.add("tick", coro_fn)
+        self._wake = asyncio.Event()
+        self._sem = asyncio.Semaphore(self.concurrency) if self.concurrency > 0 else None
+        tasks = set()
+        try:
+            while True:
+                now = time.monotonic()
+                for job in list(self.jobs.values()):
+                    if not job.running and job.due <= now:
+                        job.running = True
+                        task = asyncio.create_task(self._run(job))
+                        tasks.add(task)
+                        task.add_done_callback(tasks.discard)
 
-    async def run_forever(self, coro_fn):
-        while True:
-            try:
-                await coro_fn()
-            except Exception as e:
-                print("[scheduler] error:", e)
-            await asyncio.sleep(self.interval)
+                waiting = [job.due for job in self.jobs.values() if not job.running]
+                self._wake.clear()
+                try:
+                    delay = max(0.0, min(waiting) - time.monotonic()) if waiting else None
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._wake = None
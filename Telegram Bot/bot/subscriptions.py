@@ -0,0 +1,100 @@
+import os, yaml, logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Set
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_term(term: str) -> str:
+    """Case- and whitespace-insensitive form used to collapse identical queries"""
+    return " ".join(str(term).lower().split())
+
+
+@dataclass
+class Subscription:
+    """One chat watching a set of search terms in one or more pincodes"""
+    chat_id: int
+    terms: List[str]
+    pincodes: List[str]
+
+    def __post_init__(self):
+        self.chat_id = int(self.chat_id)
+        self.terms = list(dict.fromkeys(normalize_term(t) for t in self.terms if str(t).strip()))
+        pincodes = [str(p).strip() for p in self.pincodes]
+        # "" means no pincode (the store's default area); keep it when nothing else is given
+        self.pincodes = list(dict.fromkeys(p for p in pincodes if p)) or [""]
+
+
+def _split(value: str) -> List[str]:
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def load_subscriptions(path: str = "config.yaml") -> List[Subscription]:
+    """
+    Read `subscriptions:` from config.yaml. Without any, fall back to a
+    single subscription built from TELEGRAM_CHAT_ID, PINCODES (or PINCODE)
+    and SEARCH_TERMS.
+    """
+    config = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            config = yaml.safe_load(f) or {}
+
+    default_terms = _split(os.getenv("SEARCH_TERMS", "hot wheels"))
+    default_pincodes = _split(os.getenv("PINCODES") or os.getenv("PINCODE", ""))
+
+    subs = []
+    for entry in config.get("subscriptions") or []:
+        terms = entry.get("terms") or default_terms
+        pincodes = entry.get("pincodes") or ([entry["pincode"]] if entry.get("pincode") else default_pincodes)
+        subs.append(Subscription(entry["chat_id"], terms, pincodes or [""]))
+
+    if not subs and os.getenv("TELEGRAM_CHAT_ID"):
+        subs.append(Subscription(os.getenv("TELEGRAM_CHAT_ID"), default_terms, default_pincodes or [""]))
+    return subs
+
+
+@dataclass
+class QueryPlan:
+    """
+    Collapses every subscription into the unique (pincode, term) queries to
+    run each tick, and maps results back to the chats that asked for them.
+    """
+    subscriptions: List[Subscription]
+    _terms: Dict[str, List[str]] = field(default_factory=dict, init=False)
+    _subscribers: Dict[tuple, List[int]] = field(default_factory=dict, init=False)
+    _multi_pincode: Set[int] = field(default_factory=set, init=False)
+
+    def __post_init__(self):
+        for sub in self.subscriptions:
+            if len(sub.pincodes) > 1:
+                self._multi_pincode.add(sub.chat_id)
+            for pincode in sub.pincodes:
+                terms = self._terms.setdefault(pincode, [])
+                for term in sub.terms:
+                    if term not in terms:
+                        terms.append(term)
+                    chats = self._subscribers.setdefault((pincode, term), [])
+                    if sub.chat_id not in chats:
+                        chats.append(sub.chat_id)
+
+    @property
+    def pincodes(self) -> List[str]:
+        return list(self._terms)
+
+    def terms_for(self, pincode: str) -> List[str]:
+        return self._terms.get(pincode, [])
+
+    def subscribers(self, pincode: str, term: str) -> List[int]:
+        return self._subscribers.get((pincode, normalize_term(term)), [])
+
+    def chats_for(self, pincode: str) -> List[int]:
+        """Every chat watching `pincode`, for results that do not say which term found them"""
+        return list(dict.fromkeys(c for (p, _), chats in self._subscribers.items() if p == pincode for c in chats))
+
+    def watches_several_pincodes(self, chat_id: int) -> bool:
+        return chat_id in self._multi_pincode
+
+    def query_count(self) -> int:
+        """Unique (pincode, term) pairs, i.e. queries per store per tick"""
+        return sum(len(terms) for terms in self._terms.values())
@@ -0,0 +1,80 @@
+import os, time, logging
+
+logger = logging.getLogger(__name__)
+
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "120"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing dependency for a while.
+
+    Closed: calls go through; `failure_threshold` consecutive failures
+    open the circuit. Open: allow() refuses every call until
+    `reset_timeout` has passed, then the circuit turns half-open and
+    exactly one probe call is let through. A successful probe closes the
+    circuit, a failed one opens it for another `reset_timeout`.
+
+    record_failure() and record_success() return True only for the
+    closed -> open and -> closed transitions, so callers can report an
+    outage once instead of on every attempt.
+    """
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURES,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = max(failure_threshold, 1)
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self.stats = {"rejected": 0, "opened": 0}
+
+    def _set_state(self, state):
+        if state != self.state:
+            logger.info(f"Circuit {self.name}: {self.state} -> {state}")
+            self.state = state
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now; in half-open state only the first caller gets True"""
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._set_state(HALF_OPEN)
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self.stats["rejected"] += 1
+        return False
+
+    def retry_in(self) -> float:
+        """Seconds until the next probe is allowed while open"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def release(self):
+        """The allowed call was abandoned (e.g. cancelled) without an outcome"""
+        self._probing = False
+
+    def record_success(self) -> bool:
+        recovered = self.state != CLOSED
+        self._probing = False
+        self.failures = 0
+        self._set_state(CLOSED)
+        return recovered
+
+    def record_failure(self) -> bool:
+        self._probing = False
+        self.failures += 1
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+            opened = self.state == CLOSED
+            self.opened_at = time.monotonic()
+            self._set_state(OPEN)
+            if opened:
+                self.stats["opened"] += 1
+            return opened
+        return False
@@ -0,0 +1,84 @@
+import os, logging
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+HTTP_LIMIT = int(os.getenv("HTTP_LIMIT", "100"))
+HTTP_LIMIT_PER_HOST = int(os.getenv("HTTP_LIMIT_PER_HOST", "8"))
+HTTP_KEEPALIVE = float(os.getenv("HTTP_KEEPALIVE", "60"))
+HTTP_DNS_TTL = int(os.getenv("HTTP_DNS_TTL", "300"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+
+
+class HttpSession:
+    """
+    Long-lived, pooled aiohttp session shared by every API store adapter.
+
+    The underlying ClientSession is created lazily on first use so the
+    object can be built before the event loop starts, and must be closed
+    with close() on shutdown. Clients are handed the app's instance and
+    build a private one only when constructed without it, e.g. in a script.
+    """
+    def __init__(self, limit=HTTP_LIMIT, limit_per_host=HTTP_LIMIT_PER_HOST,
+                 keepalive=HTTP_KEEPALIVE, dns_ttl=HTTP_DNS_TTL,
+                 timeout=HTTP_TIMEOUT, connect_timeout=HTTP_CONNECT_TIMEOUT):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive = keepalive
+        self.dns_ttl = dns_ttl
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self._session = None
+        self.stats = {"requests": 0, "connections_created": 0, "connections_reused": 0}
+
+    def _trace_config(self):
+        trace = aiohttp.TraceConfig()
+
+        async def on_request_start(session, ctx, params):
+            self.stats["requests"] += 1
+
+        async def on_connection_create_end(session, ctx, params):
+            self.stats["connections_created"] += 1
+
+        async def on_connection_reuseconn(session, ctx, params):
+            self.stats["connections_reused"] += 1
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive,
+                ttl_dns_cache=self.dns_ttl,
+                use_dns_cache=True,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+                trace_configs=[self._trace_config()],
+            )
+        return self._session
+
+    def get(self, url: str, **kwargs):
+        """Same as ClientSession.get, on the shared connection pool"""
+        return self.session.get(url, **kwargs)
+
+    def reuse_ratio(self) -> float:
+        total = self.stats["connections_created"] + self.stats["connections_reused"]
+        return self.stats["connections_reused"] / total if total else 0.0
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info(
+                f"HTTP session closed: requests={self.stats['requests']}, "
+                f"new connections={self.stats['connections_created']}, "
+                f"reused={self.stats['connections_reused']}"
+            )
+        self._session = None
@@ -0,0 +1,48 @@
+import os, json, logging
+from typing import Any, Callable, Tuple
+
+logger = logging.getLogger(__name__)
+
+JSON_DECODER = os.getenv("JSON_DECODER", "auto").lower()
+
+# Fastest first; "auto" picks the first one that is installed
+PREFERENCE = ["orjson", "msgspec", "json"]
+
+
+def _orjson():
+    import orjson
+    return orjson.loads
+
+
+def _msgspec():
+    import msgspec
+    return msgspec.json.Decoder().decode
+
+
+def _stdlib():
+    # json.loads takes bytes directly and detects UTF-8/16/32 itself
+    return json.loads
+
+
+BACKENDS = {"orjson": _orjson, "msgspec": _msgspec, "json": _stdlib}
+
+
+def get_decoder(name: str = JSON_DECODER) -> Tuple[str, Callable[[bytes], Any]]:
+    """
+    Return (backend name, loads) for `name`: one of orjson, msgspec, json,
+    or auto. Every loads() accepts the raw response bytes, so no str copy
+    of the body is made. A backend that isn't installed falls back to auto.
+    """
+    if name != "auto" and name not in BACKENDS:
+        logger.warning(f"Unknown JSON_DECODER '{name}', using auto")
+        name = "auto"
+    for candidate in (PREFERENCE if name == "auto" else [name] + PREFERENCE):
+        try:
+            return candidate, BACKENDS[candidate]()
+        except ImportError:
+            if candidate == name:
+                logger.warning(f"JSON_DECODER '{name}' is not installed, falling back")
+    return "json", json.loads
+
+
+backend, loads = get_decoder()
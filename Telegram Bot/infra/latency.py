@@ -0,0 +1,28 @@
+from collections import deque
+
+
+def _nearest_rank(ordered, p: float) -> float:
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered) + 0.5) - 1))]
+
+
+class LatencyTracker:
+    """Rolling window of the last `window` latencies (seconds) with percentiles"""
+    def __init__(self, window: int = 200):
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def percentile(self, p: float) -> float:
+        """Nearest-rank percentile, 0 when there are no samples"""
+        return _nearest_rank(sorted(self.samples), p) if self.samples else 0.0
+
+    def snapshot(self) -> dict:
+        if not self.samples:
+            return {"count": 0, "p50": 0.0, "p90": 0.0, "p99": 0.0}
+        ordered = sorted(self.samples)
+        return {"count": len(ordered), "p50": _nearest_rank(ordered, 50),
+                "p90": _nearest_rank(ordered, 90), "p99": _nearest_rank(ordered, 99)}
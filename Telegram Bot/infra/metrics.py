@@ -0,0 +1,174 @@
+import os, time, bisect, logging
+from contextlib import contextmanager
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0 = no endpoint
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (1_000, 10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 5_000_000)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + [f'{n}="{v}"' for n, v in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._function = None
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    def set_function(self, fn):
+        """Read the value at scrape time; `fn` returns a number, or {label tuple: number} for labelled metrics"""
+        self._function = fn
+
+    def _samples(self):
+        if self._function is None:
+            return self._values.items()
+        value = self._function()
+        return value.items() if isinstance(value, dict) else [((), value)]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(self._samples()):
+            lines.append(f"{self.name}{_labels(self.label_names, key)} {_number(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        """Current count of the matching series, summed over the labels not given"""
+        wanted = [(i, str(labels[n])) for i, n in enumerate(self.label_names) if n in labels]
+        return sum(v for key, v in self._samples() if all(key[i] == value for i, value in wanted))
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        series = self._values.get(key)
+        if series is None:
+            series = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+        i = bisect.bisect_left(self.buckets, value)
+        if i < len(self.buckets):
+            series[0][i] += 1
+        series[1] += value
+        series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, [('le', _number(bound))])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.label_names, key, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {count}")
+        return lines
+
+
+REGISTRY = []
+
+
+def render() -> str:
+    """Every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        try:
+            lines.extend(metric.render())
+        except Exception as e:
+            logger.warning(f"Metric {metric.name} failed to render: {e}")
+    return "\n".join(lines) + "\n"
+
+
+# Polling
+TICK_SECONDS = Histogram("restock_tick_duration_seconds", "Time to check every store once")
+CHECK_SECONDS = Histogram("restock_check_duration_seconds", "Time to search, dedupe and notify one store check", ["store", "term"])
+CHECK_ERRORS = Counter("restock_check_errors_total", "Failed store checks by error type", ["store", "type"])
+REQUEST_SECONDS = Histogram("restock_request_duration_seconds", "Store API request latency", ["store", "term"])
+RESPONSE_BYTES = Histogram("restock_response_bytes", "Store API response body size", ["store"], SIZE_BUCKETS)
+REQUEST_RESULTS = Counter("restock_requests_total", "Store API responses by outcome (parsed, not_modified, unchanged, error)", ["store", "result"])
+
+# Stock state
+STATE_OP_SECONDS = Histogram("restock_state_op_duration_seconds", "StockStateRepo operation latency (load, update, compact, vacuum)", ["op"], (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1))
+
+# Notifier
+NOTIFY_QUEUE_DEPTH = Gauge("restock_notifier_queue_depth", "Alerts waiting to be sent")
+NOTIFY_SEND_SECONDS = Histogram("restock_notifier_send_seconds", "Time from queueing an alert until it was sent (or given up on)")
+NOTIFY_MESSAGES = Counter("restock_notifier_messages_total", "Telegram messages by outcome (sent, failed, dropped, retries)", ["result"])
+
+# Browser stores
+BROWSER_PHASE_SECONDS = Histogram("restock_browser_phase_seconds", "Browser search timings by phase (tab, input, submit, results, extract, total)", ["store", "phase"])
+
+
+class MetricsServer:
+    """Serves render() at /metrics on METRICS_HOST:METRICS_PORT"""
+    def __init__(self, port: int = METRICS_PORT, host: str = METRICS_HOST):
+        self.port = port
+        self.host = host
+        self._runner = None
+
+    async def _handle(self, request):
+        return web.Response(body=render().encode(), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+    async def start(self):
+        if not self.port:
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Metrics at http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
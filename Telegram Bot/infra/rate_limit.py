@@ -0,0 +1,29 @@
+import time, asyncio
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens per second, holding at most
+    `capacity`. acquire() waits until a token is available.
+    """
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    async def acquire(self):
+        while not self.try_acquire():
+            await asyncio.sleep((1 - self.tokens) / self.rate)
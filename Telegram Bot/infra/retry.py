@@ -0,0 +1,65 @@
+import os, asyncio
+from dataclasses import dataclass, field
+from typing import FrozenSet
+import aiohttp
+from tenacity import AsyncRetrying, stop_after_attempt, wait_exponential_jitter, retry_if_exception
+
+RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", "3"))
+RETRY_BACKOFF = float(os.getenv("RETRY_BACKOFF", "0.5"))
+RETRY_MAX_BACKOFF = float(os.getenv("RETRY_MAX_BACKOFF", "8"))
+RETRY_JITTER = float(os.getenv("RETRY_JITTER", "0.5"))
+RETRY_STATUSES = os.getenv("RETRY_STATUSES", "429,500,502,503,504")
+
+
+class HTTPStatusError(RuntimeError):
+    """A response whose status the retry policy treats as transient"""
+    def __init__(self, status: int, url: str):
+        super().__init__(f"HTTP {status} from {url}")
+        self.status = status
+
+
+def _statuses(value) -> FrozenSet[int]:
+    if isinstance(value, str):
+        value = [v for v in value.split(",") if v.strip()]
+    return frozenset(int(v) for v in value)
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Which failures of a store request are retried and how: connection
+    errors, timeouts and responses with one of `statuses` are retried up
+    to `attempts` tries in total, waiting exponentially from `backoff` up
+    to `max_backoff` seconds plus up to `jitter` seconds of randomness.
+    """
+    attempts: int = RETRY_ATTEMPTS
+    backoff: float = RETRY_BACKOFF
+    max_backoff: float = RETRY_MAX_BACKOFF
+    jitter: float = RETRY_JITTER
+    statuses: FrozenSet[int] = field(default_factory=lambda: _statuses(RETRY_STATUSES))
+
+    def __post_init__(self):
+        self.attempts = max(int(self.attempts), 1)
+        self.statuses = _statuses(self.statuses)
+
+    @classmethod
+    def from_config(cls, config: dict = None) -> "RetryPolicy":
+        """Build from a store's `retry:` mapping in config.yaml; missing keys use the RETRY_* defaults"""
+        config = dict(config or {})
+        unknown = set(config) - {"attempts", "backoff", "max_backoff", "jitter", "statuses"}
+        if unknown:
+            raise ValueError(f"Unknown retry settings {sorted(unknown)}")
+        return cls(**config)
+
+    def is_retriable(self, error: BaseException) -> bool:
+        if isinstance(error, HTTPStatusError):
+            return error.status in self.statuses
+        return isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError))
+
+    def retrying(self) -> AsyncRetrying:
+        return AsyncRetrying(
+            stop=stop_after_attempt(self.attempts),
+            wait=wait_exponential_jitter(initial=self.backoff, max=self.max_backoff, jitter=self.jitter),
+            retry=retry_if_exception(self.is_retriable),
+            reraise=True,
+        )
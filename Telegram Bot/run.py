@@ -1,6 +1,17 @@
-import asyncio
+import os, sys, asyncio
 from bot.app import App
 
 if __name__ == "__main__":
-    app = App()
+    # `python run.py coordinator` / `python run.py worker` split polling across processes
+    role = sys.argv[1] if len(sys.argv) > 1 else os.getenv("CLUSTER_ROLE", "")
+    if role == "coordinator":
+        from bot.cluster import Coordinator
+        app = Coordinator()
+    elif role == "worker":
+        from bot.cluster import Worker
+        app = Worker()
+    elif role:
+        sys.exit(f"Unknown role '{role}', expected 'coordinator' or 'worker'")
+    else:
+        app = App()
     asyncio.run(app.run())
@@ -2,5 +2,5 @@ from typing import List, Dict, Protocol
 
 class StoreClient(Protocol):
     async def search(self, terms: list[str]) -> List[Dict]:
-        """Return list of dicts: {id, name, price, in_stock (bool), url}"""
+        """Return list of dicts: {id, name, price, in_stock (bool), url, term (the query that found it)}"""
         ...
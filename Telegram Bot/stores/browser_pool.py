@@ -0,0 +1,368 @@
+import os, re, time, asyncio, fnmatch, inspect, logging
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+
+logger = logging.getLogger(__name__)
+
+BROWSER_RECYCLE_AFTER = int(os.getenv("BROWSER_RECYCLE_AFTER", "50"))
+BROWSER_HEADLESS = os.getenv("BROWSER_HEADLESS", "1").lower() not in ("0", "false", "no")
+BROWSER_TABS = int(os.getenv("BROWSER_TABS", "3"))
+BROWSER_MAX_CONTEXTS = int(os.getenv("BROWSER_MAX_CONTEXTS", "0"))  # 0 = one per store and pincode, no cap
+
+DEFAULT_BLOCK_TYPES = "image,media,font"
+DEFAULT_BLOCK_URLS = (
+    "*google-analytics.com*,*googletagmanager.com*,*doubleclick.net*,*facebook.net*,"
+    "*clarity.ms*,*hotjar.com*,*branch.io*,*sentry.io*,*newrelic.com*,*moengage.com*"
+)
+
+# Rough transfer sizes used to estimate what a blocked request would have cost
+_EST_BYTES = {"image": 40_000, "media": 400_000, "font": 30_000, "script": 60_000, "stylesheet": 25_000}
+_EST_BYTES_OTHER = 5_000
+
+# Returns the first element matching the selectors in priority order, or null
+_FIRST_MATCH_JS = """
+sels => {
+    for (const s of sels) {
+        const el = document.querySelector(s);
+        if (el) return el;
+    }
+    return null;
+}
+"""
+
+
+def _split(value):
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def _globs(patterns):
+    return re.compile("|".join(fnmatch.translate(p) for p in patterns)) if patterns else None
+
+
+class RouteBlocker:
+    """
+    Aborts requests we never read (images, fonts, trackers...) before they
+    leave the browser. A request is blocked when its resource type is in
+    `block_types` or its URL matches a `block_urls` glob, unless it matches
+    an `allow_urls` glob.
+    """
+    def __init__(self, block_types=(), block_urls=(), allow_urls=()):
+        self.block_types = frozenset(block_types)
+        self._deny = _globs(list(block_urls))
+        self._allow = _globs(list(allow_urls))
+        self.stats = {"blocked_requests": 0, "blocked_bytes_est": 0, "allowed_requests": 0}
+
+    @classmethod
+    def from_env(cls, prefix: str):
+        """Per-store lists from {PREFIX}_BLOCK_TYPES/_BLOCK_URLS/_ALLOW_URLS, falling back to BROWSER_*"""
+        def get(name, default):
+            return os.getenv(f"{prefix}_{name}", os.getenv(f"BROWSER_{name}", default))
+        return cls(
+            _split(get("BLOCK_TYPES", DEFAULT_BLOCK_TYPES)),
+            _split(get("BLOCK_URLS", DEFAULT_BLOCK_URLS)),
+            _split(get("ALLOW_URLS", "")),
+        )
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        if self._allow is not None and self._allow.match(url):
+            return False
+        if resource_type in self.block_types:
+            return True
+        return self._deny is not None and self._deny.match(url) is not None
+
+    async def handle(self, route, request):
+        if not self.should_block(request.resource_type, request.url):
+            self.stats["allowed_requests"] += 1
+            await route.continue_()
+            return
+        size = _EST_BYTES.get(request.resource_type, _EST_BYTES_OTHER)
+        self.stats["blocked_requests"] += 1
+        self.stats["blocked_bytes_est"] += size
+        try:
+            counts = request.frame.page._rb_blocked
+            counts["requests"] += 1
+            counts["bytes_est"] += size
+        except Exception:
+            pass
+        await route.abort("blockedbyclient")
+
+    async def install(self, context):
+        await context.route("**/*", self.handle)
+
+
+class _Slot:
+    def __init__(self, context, tabs):
+        self.context = context
+        self.idle = []
+        self.sem = asyncio.Semaphore(tabs)
+        self.uses = 0
+        self.busy = 0
+        self.retired = False
+        self.last_used = time.monotonic()
+
+
+class _NetworkTracker:
+    """Counts in-flight requests of a page from Playwright events, without extra CDP calls"""
+    def __init__(self, page):
+        self.inflight = 0
+        self.last_activity = time.monotonic()
+        page.on("request", self._start)
+        page.on("requestfinished", self._finish)
+        page.on("requestfailed", self._finish)
+
+    def _start(self, _):
+        self.inflight += 1
+        self.last_activity = time.monotonic()
+
+    def _finish(self, _):
+        self.inflight = max(0, self.inflight - 1)
+        self.last_activity = time.monotonic()
+
+
+class CallCounter:
+    """
+    Wraps a Playwright page (and the handles it returns) and counts every
+    awaited call, i.e. every round trip to the browser over CDP.
+    """
+    def __init__(self):
+        self.calls = 0
+
+    def wrap(self, obj):
+        if isinstance(obj, list):
+            return [self.wrap(o) for o in obj]
+        if obj is None or not type(obj).__module__.startswith("playwright"):
+            return obj
+        return _Counted(obj, self)
+
+
+class _Counted:
+    def __init__(self, target, counter):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_counter", counter)
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return self._counter.wrap(attr)
+        counter = self._counter
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if not inspect.isawaitable(result):
+                return counter.wrap(result)
+
+            async def counted():
+                counter.calls += 1
+                return counter.wrap(await result)
+            return counted()
+        return call
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, value)
+
+
+async def wait_for_network_idle(page, quiet=0.5, timeout=10.0, since=None, min_wait=2.0):
+    """
+    Wait until `page` has had no request in flight for `quiet` seconds.
+    With `since` (a time.monotonic() value, e.g. when a search was
+    submitted), quiet from before it doesn't count: there must have been
+    network activity after `since`, or `min_wait` seconds must have passed
+    without any, so a reused tab isn't idle before its request goes out.
+    """
+    tracker = getattr(page, "_rb_network", None)
+    if tracker is None:
+        return
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        now = time.monotonic()
+        started = since is None or tracker.last_activity >= since or now - since >= min_wait
+        if started and tracker.inflight == 0 and now - tracker.last_activity >= quiet:
+            return
+        await asyncio.sleep(0.05)
+
+
+async def wait_for_first(page, selectors, timeout=5000, fallback=None, fallback_timeout=1000):
+    """
+    Wait for any of `selectors` and return the element for the highest-priority
+    one. A catch-all `fallback` selector is only tried once they time out, so it
+    can't win while the page is still rendering the element they describe.
+    """
+    try:
+        handle = await page.wait_for_function(_FIRST_MATCH_JS, arg=list(selectors), timeout=timeout)
+    except PlaywrightTimeoutError:
+        if not fallback:
+            raise
+        logger.warning(f"None of {list(selectors)} matched on {page.url}, falling back to {fallback!r}")
+        handle = await page.wait_for_function(_FIRST_MATCH_JS, arg=[fallback], timeout=fallback_timeout)
+    return handle.as_element()
+
+
+class BrowserPool:
+    """
+    Keeps one Chromium process and a warm context per store (and pincode)
+    alive across ticks.
+
+    Each context holds up to `tabs` pages so terms can be searched in
+    parallel. A context is retired after `recycle_after` searches, or when
+    a search fails, and closed once its open tabs are handed back; the
+    browser is relaunched on the next use if it crashed. With
+    `max_contexts` set, opening a context beyond it first closes the idle
+    context used least recently. App.run owns the pool, passes it to every
+    browser client and calls close() on shutdown; a client only creates
+    its own when used standalone.
+    """
+    def __init__(self, recycle_after=BROWSER_RECYCLE_AFTER, headless=BROWSER_HEADLESS, tabs=BROWSER_TABS,
+                 max_contexts=BROWSER_MAX_CONTEXTS):
+        self.recycle_after = recycle_after
+        self.headless = headless
+        self.tabs = max(tabs, 1)
+        self.max_contexts = max_contexts
+        self._pw = None
+        self._browser = None
+        self._slots = {}
+        self._lock = None
+        self._key_locks = {}
+        self.last_launch_seconds = 0.0
+        self.stats = {"launches": 0, "contexts_created": 0, "contexts_recycled": 0, "contexts_evicted": 0,
+                      "crashes": 0, "pages_opened": 0}
+
+    async def _ensure_browser(self):
+        if self._browser is not None and self._browser.is_connected():
+            return self._browser
+        if self._browser is not None:
+            logger.warning("Chromium disconnected, relaunching")
+            self.stats["crashes"] += 1
+            self._slots.clear()
+        started = time.monotonic()
+        if self._pw is None:
+            self._pw = await async_playwright().start()
+        self._browser = await self._pw.chromium.launch(headless=self.headless)
+        self.last_launch_seconds = time.monotonic() - started
+        self.stats["launches"] += 1
+        return self._browser
+
+    async def _close_slot(self, slot):
+        try:
+            await slot.context.close()
+        except Exception:
+            pass
+
+    async def _retire(self, key, slot):
+        slot.retired = True
+        if self._slots.get(key) is slot:
+            del self._slots[key]
+        if slot.busy == 0:
+            await self._close_slot(slot)
+
+    async def _evict_idle(self):
+        """Close the least recently used idle context; all busy ones are kept, so the cap is soft"""
+        idle = [(slot.last_used, key) for key, slot in self._slots.items() if slot.busy == 0]
+        if not idle:
+            return
+        _, key = min(idle)
+        self.stats["contexts_evicted"] += 1
+        await self._retire(key, self._slots[key])
+
+    async def _slot(self, key, context_options, blocker=None):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            browser = await self._ensure_browser()
+
+        async with self._key_locks.setdefault(key, asyncio.Lock()):
+            slot = self._slots.get(key)
+            if slot is not None and slot.uses >= self.recycle_after:
+                self.stats["contexts_recycled"] += 1
+                await self._retire(key, slot)
+                slot = None
+            if slot is None:
+                if self.max_contexts and len(self._slots) >= self.max_contexts:
+                    await self._evict_idle()
+                if blocker is not None:
+                    # Service workers would fetch behind the router's back
+                    context_options.setdefault("service_workers", "block")
+                context = await browser.new_context(**context_options)
+                if blocker is not None:
+                    await blocker.install(context)
+                slot = _Slot(context, self.tabs)
+                self._slots[key] = slot
+                self.stats["contexts_created"] += 1
+            return slot
+
+    async def _open_page(self, slot, warm):
+        page = await slot.context.new_page()
+        page._rb_network = _NetworkTracker(page)
+        page._rb_blocked = {"requests": 0, "bytes_est": 0}
+        self.stats["pages_opened"] += 1
+        if warm is not None:
+            try:
+                await warm(page)
+            except BaseException:
+                await page.close()
+                raise
+        return page
+
+    @asynccontextmanager
+    async def tab(self, key: str, warm=None, blocker: RouteBlocker = None, **context_options):
+        """
+        Borrow a warm page of the `key` context for one search. At most
+        `tabs` pages per context are in use at once; `warm(page)` is awaited
+        once per new page, e.g. to open the store's home page. A `blocker`
+        is installed on the context when it is created.
+        """
+        while True:
+            slot = await self._slot(key, context_options, blocker)
+            await slot.sem.acquire()
+            if not slot.retired:
+                break
+            # Recycled or discarded by another search while we waited for a tab;
+            # its context may already be closed, so start over on the current one
+            slot.sem.release()
+        slot.uses += 1
+        slot.busy += 1
+        slot.last_used = time.monotonic()
+        page = None
+        try:
+            while slot.idle and page is None:
+                page = slot.idle.pop()
+                if page.is_closed():
+                    page = None
+            if page is None:
+                page = await self._open_page(slot, warm)
+            yield page
+        except BaseException:
+            # The page is in an unknown state, don't hand it out again
+            if page is not None:
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+                page = None
+            raise
+        finally:
+            slot.busy -= 1
+            slot.sem.release()
+            if page is not None and not slot.retired:
+                slot.idle.append(page)
+            if slot.retired and slot.busy == 0:
+                await self._close_slot(slot)
+
+    async def discard(self, key: str):
+        """Retire a context that misbehaved so the next use starts fresh"""
+        slot = self._slots.get(key)
+        if slot is not None:
+            await self._retire(key, slot)
+
+    async def close(self):
+        for slot in list(self._slots.values()):
+            await self._close_slot(slot)
+        self._slots.clear()
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+        if self._pw is not None:
+            await self._pw.stop()
+            self._pw = None
@@ -0,0 +1,62 @@
+import os
+from typing import List, Dict
+
+BROWSER_MAX_CARDS = int(os.getenv("BROWSER_MAX_CARDS", "50"))
+
+# Runs entirely inside the page: picks the first card selector with fresh
+# matches and returns plain records, so a whole results page costs one
+# round trip instead of several per card.
+_EXTRACT_JS = """
+({cards, titles, button, price, link, stale, limit}) => {
+    const leafWith = (root, text) => {
+        const hits = Array.from(root.querySelectorAll("*")).filter(el => el.textContent.includes(text));
+        const leaf = hits.find(el => !Array.from(el.children).some(c => c.textContent.includes(text)));
+        return leaf || (root.textContent.includes(text) ? root : null);
+    };
+    for (const sel of cards) {
+        const els = Array.from(document.querySelectorAll(`${sel}:not([${stale}])`));
+        if (!els.length) continue;
+        return els.slice(0, limit).map(card => {
+            let title = "";
+            for (const t of titles) {
+                const el = card.querySelector(t);
+                if (el) {
+                    title = (el.innerText || el.textContent || "").trim();
+                    if (title) break;
+                }
+            }
+            const priceEl = price ? leafWith(card, price) : null;
+            const a = card.querySelector(link);
+            return {
+                title: title,
+                price: priceEl ? (priceEl.innerText || priceEl.textContent || "").trim() : "",
+                in_stock: card.querySelectorAll(button).length > 0,
+                href: a ? (a.getAttribute("href") || "") : "",
+            };
+        });
+    }
+    return [];
+}
+"""
+
+
+def as_list(value) -> List[str]:
+    return [value] if isinstance(value, str) else list(value)
+
+
+async def extract_cards(page, sel: dict, stale_attr: str, limit: int = BROWSER_MAX_CARDS) -> List[Dict]:
+    """
+    Extract up to `limit` product cards in a single page.evaluate call.
+    `sel` is a store's selector config: product_card and product_title are
+    tried in priority order, add_button marks a card as in stock, price_text
+    locates the price and link the product URL.
+    """
+    return await page.evaluate(_EXTRACT_JS, {
+        "cards": as_list(sel["product_card"]),
+        "titles": as_list(sel["product_title"]),
+        "button": sel["add_button"],
+        "price": sel["price_text"],
+        "link": sel["link"],
+        "stale": stale_attr,
+        "limit": limit,
+    })
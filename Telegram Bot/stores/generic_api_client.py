@@ -1,26 +1,186 @@
-import os, json, aiohttp
-from typing import List, Dict
+import os, time, asyncio, hashlib, logging
+from typing import List, Dict, Callable
 from infra.user_agents import random_ua
+from infra.http import HttpSession
+from infra import json_codec
+from infra.latency import LatencyTracker
+from infra.retry import RetryPolicy, HTTPStatusError
+from infra.metrics import REQUEST_SECONDS, RESPONSE_BYTES, REQUEST_RESULTS
 from yarl import URL
 
+logger = logging.getLogger(__name__)
+
+TERM_CONCURRENCY = int(os.getenv("TERM_CONCURRENCY", "4"))
+# Save every new response body here, e.g. for benchmarks/bench_json.py
+API_RECORD_DIR = os.getenv("API_RECORD_DIR", "").strip()
+# Hedged requests: duplicate a request still unanswered at this percentile of the client's latency
+HEDGE_REQUESTS = os.getenv("HEDGE_REQUESTS", "0").lower() in ("1", "true", "yes")
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "90"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+
 class GenericAPIClient:
-    def __init__(self, url_template: str, headers: dict, pincode: str):
+    def __init__(self, url_template: str, headers: dict, pincode: str, http: HttpSession = None,
+                 retry: RetryPolicy = None, hedge: bool = HEDGE_REQUESTS, name: str = ""):
         self.url_template = url_template
         self.headers = headers or {}
         self.pincode = pincode
+        self.name = name or URL(url_template).host or "api"
+        self.http = http or HttpSession()
+        self.term_concurrency = max(TERM_CONCURRENCY, 1)
+        self._term_sem = None
+        # Per URL (so per pincode and term): validators, body hash and the products parsed from it
+        self._cache = {}
+        self.retry = retry or RetryPolicy()
+        self.hedge = hedge
+        self.latency = LatencyTracker()
+        self.stats = {"requests": 0, "not_modified": 0, "unchanged": 0, "parsed": 0,
+                      "retries": 0, "hedged": 0, "hedge_wins": 0}
 
     def _format_url(self, query: str) -> str:
         url = self.url_template.replace("{PINCODE}", self.pincode).replace("{QUERY}", query)
         return url
 
-    async def _get_json(self, url: str):
+    async def _fetch(self, url: str, parse: Callable[[dict], List[Dict]], term: str = "") -> List[Dict]:
+        """
+        Fetch and parse one search. The request is conditional when the
+        endpoint sent an ETag or Last-Modified before; if it still returns a
+        full body identical to the previous one, decoding and parsing are
+        skipped and the previous products are reused.
+        """
         headers = dict(self.headers)
         if "User-Agent" not in headers:
             headers["User-Agent"] = random_ua()
-        async with aiohttp.ClientSession(headers=headers) as session:
-            async with session.get(url, timeout=15) as resp:
-                try:
-                    return await resp.json(content_type=None)
-                except Exception:
-                    text = await resp.text()
-                    raise RuntimeError(f"Failed parsing JSON. Status={resp.status}. Body={text[:400]}")
+        cached = self._cache.get(url)
+        if cached is not None:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        self.stats["requests"] += 1
+        started = time.monotonic()
+        async with self.http.get(url, headers=headers) as resp:
+            if resp.status in self.retry.statuses:
+                REQUEST_RESULTS.inc(store=self.name, result="error")
+                raise HTTPStatusError(resp.status, URL(url).host)
+            if resp.status == 304 and cached is not None:
+                self._observe(started, term, "not_modified")
+                self.stats["not_modified"] += 1
+                return [dict(p) for p in cached["products"]]
+            body = await resp.read()
+            RESPONSE_BYTES.observe(len(body), store=self.name)
+            digest = hashlib.blake2b(body, digest_size=16).digest()
+            if cached is not None and cached["hash"] == digest and resp.status == cached["status"]:
+                self._observe(started, term, "unchanged")
+                self.stats["unchanged"] += 1
+                cached["etag"] = resp.headers.get("ETag")
+                cached["last_modified"] = resp.headers.get("Last-Modified")
+                return [dict(p) for p in cached["products"]]
+            try:
+                data = json_codec.loads(body)
+            except Exception:
+                REQUEST_RESULTS.inc(store=self.name, result="error")
+                text = body.decode(resp.charset or "utf-8", errors="replace")
+                raise RuntimeError(f"Failed parsing JSON. Status={resp.status}. Body={text[:400]}")
+
+        if API_RECORD_DIR:
+            self._record(url, body, digest)
+        products = parse(data)
+        self._observe(started, term, "parsed")
+        self.stats["parsed"] += 1
+        self._cache[url] = {
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "hash": digest,
+            "status": resp.status,
+            "products": [dict(p) for p in products],
+        }
+        return products
+
+    def _observe(self, started: float, term: str, result: str):
+        elapsed = time.monotonic() - started
+        self.latency.record(elapsed)
+        REQUEST_SECONDS.observe(elapsed, store=self.name, term=term)
+        REQUEST_RESULTS.inc(store=self.name, result=result)
+
+    async def _fetch_hedged(self, url: str, parse: Callable[[dict], List[Dict]], term: str = "") -> List[Dict]:
+        """
+        _fetch, plus a duplicate request when the first one hasn't answered
+        by the client's observed HEDGE_PERCENTILE latency; whichever
+        succeeds first wins and the other is cancelled.
+        """
+        if not self.hedge or len(self.latency) < HEDGE_MIN_SAMPLES:
+            return await self._fetch(url, parse, term)
+
+        tasks = [asyncio.ensure_future(self._fetch(url, parse, term))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.latency.percentile(HEDGE_PERCENTILE))
+            if not done:
+                self.stats["hedged"] += 1
+                tasks.append(asyncio.ensure_future(self._fetch(url, parse, term)))
+
+            pending, error = set(tasks), None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if len(tasks) > 1 and task is tasks[1]:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _fetch_with_retry(self, url: str, parse: Callable[[dict], List[Dict]], term: str = "") -> List[Dict]:
+        async for attempt in self.retry.retrying():
+            with attempt:
+                if attempt.retry_state.attempt_number > 1:
+                    self.stats["retries"] += 1
+                return await self._fetch_hedged(url, parse, term)
+
+    def _record(self, url: str, body: bytes, digest: bytes):
+        try:
+            os.makedirs(API_RECORD_DIR, exist_ok=True)
+            with open(os.path.join(API_RECORD_DIR, f"{URL(url).host}-{digest.hex()[:12]}.json"), "wb") as f:
+                f.write(body)
+        except OSError as e:
+            logger.warning(f"Could not record response of {URL(url).host}: {e}")
+
+    def skip_rate(self) -> float:
+        """Share of requests answered without decoding: 304s plus byte-identical bodies"""
+        skipped = self.stats["not_modified"] + self.stats["unchanged"]
+        return skipped / self.stats["requests"] if self.stats["requests"] else 0.0
+
+    async def search_terms(self, terms: List[str], parse: Callable[[dict], List[Dict]]) -> List[Dict]:
+        """
+        Query every term concurrently, bounded by TERM_CONCURRENCY per store,
+        and merge the parsed products in term order. A failing term is logged
+        and skipped; only if every term fails is the first error raised.
+        """
+        if self._term_sem is None:
+            self._term_sem = asyncio.Semaphore(self.term_concurrency)
+
+        async def one(q):
+            async with self._term_sem:
+                products = await self._fetch_with_retry(self._format_url(q), parse, q)
+            for p in products:
+                p["term"] = q  # lets the app route results back to the subscribers of this term
+            return products
+
+        outcomes = await asyncio.gather(*(one(q) for q in terms), return_exceptions=True)
+
+        results, errors = [], []
+        for q, outcome in zip(terms, outcomes):
+            if isinstance(outcome, BaseException):
+                if isinstance(outcome, asyncio.CancelledError):
+                    raise outcome
+                logger.warning(f"Query '{q}' failed on {URL(self._format_url(q)).host}: {outcome}")
+                errors.append(outcome)
+                continue
+            results.extend(outcome)
+
+        if errors and len(errors) == len(terms):
+            raise errors[0]
+        return results
@@ -0,0 +1,176 @@
+import os, re, json, yaml
+from dataclasses import dataclass, field, fields as dataclass_fields, replace
+from typing import Callable, Dict, List, Optional
+from .generic_api_client import GenericAPIClient
+from infra.http import HttpSession
+from infra.retry import RetryPolicy
+from dotenv import load_dotenv
+load_dotenv()
+
+# Where a search response keeps its product list, and where each product keeps
+# the fields we read; alternatives are tried in order and the first truthy one
+# wins. Dotted paths reach into nested objects ("inventory.available").
+DEFAULT_PRODUCTS = ["products", "data", "items"]
+DEFAULT_FIELDS = {
+    "id": ["id", "sku"],
+    "name": ["name", "title"],
+    "price": ["price", "mrp", "final_price"],
+    "in_stock": ["in_stock", "available", "is_available", "inventory.available"],
+    "url": ["url", "product_url"],
+}
+
+
+def _as_paths(value) -> List[str]:
+    return [value] if isinstance(value, str) else [str(v) for v in value]
+
+
+def _env_prefix(name: str) -> str:
+    return re.sub(r"[^A-Z0-9]+", "_", name.upper()).strip("_")
+
+
+def _load_headers(env_key: str):
+    j = os.getenv(env_key, "").strip()
+    if not j:
+        return {}
+    try:
+        return json.loads(j)
+    except Exception:
+        return {}
+
+
+def _path_expr(path: str) -> str:
+    """Python expression reading a dotted path from the current item `p`"""
+    head, *rest = path.split(".")
+    expr = f"p.get({head!r})"
+    for part in rest:
+        expr = f"({expr} or _EMPTY).get({part!r})"
+    return expr
+
+
+def _chain(paths: List[str]) -> str:
+    return " or ".join(_path_expr(p) for p in paths)
+
+
+def compile_extractor(spec: "StoreSpec") -> Callable[[dict], List[Dict]]:
+    """
+    Generate and compile a parse function for `spec`'s field paths: one
+    list comprehension of straight-line lookups, with no per-item
+    interpretation of the configuration and no temporary objects for
+    missing nested keys.
+    """
+    f = spec.fields
+    url = f"{_chain(f['url'])} or ''"
+    if spec.base_url:
+        url = f"_BASE_URL + u if (u := {url}).startswith('/') else u"
+    products = " or ".join(_path_expr(p).replace("p.get(", "data.get(", 1) for p in spec.products)
+    source = "\n".join([
+        "def extract(data):",
+        "    return [",
+        "        {",
+        f"            'id': i if (i := {_chain(f['id'])} or name).__class__ is str else str(i),",
+        "            'name': name,",
+        f"            'price': {_chain(f['price'])} or '',",
+        f"            'in_stock': True if ({_chain(f['in_stock'])}) else False,",
+        f"            'url': {url},",
+        "        }",
+        f"        for p in ({products} or ())",
+        f"        for name in (({_chain(f['name'])} or '').strip(),)",
+        "        if name",
+        "    ]",
+    ])
+    namespace = {"_EMPTY": {}, "_BASE_URL": spec.base_url.rstrip("/")}
+    exec(compile(source, f"<extractor {spec.name}>", "exec"), namespace)
+    extract = namespace["extract"]
+    extract.source = source
+    return extract
+
+
+@dataclass
+class StoreSpec:
+    """
+    Everything needed to query one store's search API. `url` and
+    `headers` default to the {NAME}_API_URL and {NAME}_API_HEADERS_JSON
+    environment variables; `browser` names the browser client used when
+    the API isn't configured (or in browser mode). `retry` overrides the
+    RETRY_* policy for this store and `hedge` the HEDGE_REQUESTS default.
+    """
+    name: str
+    url: str = ""
+    headers: Dict[str, str] = field(default_factory=dict)
+    url_env: str = ""
+    headers_env: str = ""
+    products: List[str] = field(default_factory=lambda: list(DEFAULT_PRODUCTS))
+    fields: Dict[str, List[str]] = field(default_factory=dict)
+    base_url: str = ""
+    browser: str = ""
+    retry: Dict[str, object] = field(default_factory=dict)
+    hedge: Optional[bool] = None
+    extract: Callable[[dict], List[Dict]] = field(default=None, init=False, repr=False, compare=False)
+    retry_policy: RetryPolicy = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        prefix = _env_prefix(self.name)
+        self.url_env = self.url_env or f"{prefix}_API_URL"
+        self.headers_env = self.headers_env or f"{prefix}_API_HEADERS_JSON"
+        self.products = _as_paths(self.products)
+        unknown = set(self.fields) - set(DEFAULT_FIELDS)
+        if unknown:
+            raise ValueError(f"Store '{self.name}': unknown fields {sorted(unknown)}, expected {list(DEFAULT_FIELDS)}")
+        self.fields = {k: _as_paths(self.fields.get(k, v)) for k, v in DEFAULT_FIELDS.items()}
+        self.extract = compile_extractor(self)
+        self.retry_policy = RetryPolicy.from_config(self.retry)
+
+
+BUILTIN_STORES = [
+    StoreSpec("Blinkit", browser="blinkit"),
+    StoreSpec("Swiggy", browser="swiggy"),
+    StoreSpec("Zepto"),
+    StoreSpec("JioMart"),
+    StoreSpec("BigBasket"),
+]
+
+_SPEC_KEYS = {f.name for f in dataclass_fields(StoreSpec) if f.init}
+
+
+def load_registry(path: str = "config.yaml") -> List[StoreSpec]:
+    """
+    The built-in stores plus the `stores:` entries of config.yaml. An
+    entry with a built-in store's name overrides just the keys it sets;
+    any other entry adds a store.
+    """
+    config = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            config = yaml.safe_load(f) or {}
+
+    specs = {spec.name.lower(): spec for spec in BUILTIN_STORES}
+    for entry in config.get("stores") or []:
+        unknown = set(entry) - _SPEC_KEYS
+        if unknown or "name" not in entry:
+            raise ValueError(f"Invalid store entry {entry!r}: needs 'name', unknown keys {sorted(unknown)}")
+        key = str(entry["name"]).lower()
+        base = specs.get(key)
+        if base is None:
+            specs[key] = StoreSpec(**entry)
+        else:
+            specs[key] = replace(base, **{**entry, "name": base.name, "fields": {**base.fields, **entry.get("fields", {})}})
+    return list(specs.values())
+
+
+class APIStore:
+    """StoreClient for any store declared with a StoreSpec"""
+    def __init__(self, spec: StoreSpec, pincode: str, http: HttpSession = None):
+        self.spec = spec
+        self.url = (spec.url or os.getenv(spec.url_env, "")).strip()
+        self.headers = {**_load_headers(spec.headers_env), **spec.headers}
+        self.pincode = pincode
+        hedge = {} if spec.hedge is None else {"hedge": spec.hedge}
+        self.client = GenericAPIClient(self.url, self.headers, pincode, http, spec.retry_policy, name=spec.name, **hedge)
+
+    def enabled(self):
+        return bool(self.url)
+
+    async def search(self, terms: list[str]) -> List[Dict]:
+        if not self.url:
+            return []
+        return await self.client.search_terms(terms, self.spec.extract)
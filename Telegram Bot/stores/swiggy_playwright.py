@@ -1,120 +1,153 @@
-import asyncio
+import os, asyncio, logging, time
 from typing import List, Dict
-from playwright.async_api import async_playwright
 from infra.user_agents import random_ua
+from infra.metrics import BROWSER_PHASE_SECONDS
+from .browser_pool import BrowserPool, RouteBlocker, CallCounter, wait_for_first, wait_for_network_idle
+from .dom_extract import extract_cards, as_list
+
+logger = logging.getLogger(__name__)
+
+# Overridable to point the client at benchmarks/browser_fixture_server.py
+HOME_URL = os.getenv("SWIGGY_HOME_URL", "https://www.swiggy.com/instamart")
+BASE_URL = "https://www.swiggy.com"
+
+SEARCH_SELECTORS = [
+    "input[placeholder*='search']",
+    "input[type='search']",
+    "input[name='search']",
+    "[data-testid*='search']"
+]
+SEARCH_FALLBACK = "input"  # any input, once none of the above shows up
+PRODUCT_SELECTORS = [
+    "[data-testid*='product']",
+    ".product-card",
+    ".item-card",
+    ".product",
+    "[class*='product']"
+]
+TITLE_SELECTORS = ["h3", "h4", ".product-title", ".item-title", "[class*='title']"]
+
+# Cards left over from the previous search in a reused tab are tagged so they are never mistaken for new results
+STALE_ATTR = "data-rb-stale"
+_MARK_STALE_JS = "([sel, attr]) => document.querySelectorAll(sel).forEach(el => el.setAttribute(attr, '1'))"
 
 class SwiggyBrowser:
-    def __init__(self, pincode: str, selectors: dict):
+    def __init__(self, pincode: str, selectors: dict, pool: BrowserPool = None):
         self.pincode = pincode
-        # Use default selectors if none provided
-        self.sel = selectors or {
-            "search_input": "input[placeholder*='search'], input[type='search'], input[name='search']",
-            "product_card": "[data-testid*='product'], .product-card, .item-card",
-            "product_title": "h3, h4, .product-title, .item-title",
-            "add_button": "button[aria-label*='add'], .add-to-cart, button:has-text('Add')"
+        self.pool = pool or BrowserPool()
+        self.key = f"swiggy:{pincode}"
+        self.last_timings = {}
+        self.blocker = RouteBlocker.from_env("SWIGGY")
+        # Use default selectors if none provided; lists are tried in priority order
+        self.sel = {
+            "search_input": SEARCH_SELECTORS,
+            "search_fallback": SEARCH_FALLBACK,
+            "product_card": PRODUCT_SELECTORS,
+            "product_title": TITLE_SELECTORS,
+            "add_button": "button",
+            "price_text": "₹",
+            "link": "a",
+            **(selectors or {}),
         }
 
+    async def _open_home(self, page):
+        await page.goto(HOME_URL, wait_until="domcontentloaded", timeout=30000)
+        # Ready as soon as a search box shows up, instead of a fixed sleep
+        await wait_for_first(page, as_list(self.sel["search_input"]), timeout=15000, fallback=self.sel["search_fallback"])
+
+    async def _wait_for_results(self, page, submitted: float):
+        """Return once fresh result cards appear or the page's network goes quiet after `submitted`, whichever is first"""
+        fresh = ", ".join(f"{s}:not([{STALE_ATTR}])" for s in as_list(self.sel["product_card"]))
+        waits = [
+            asyncio.ensure_future(page.wait_for_selector(fresh, timeout=10000)),
+            asyncio.ensure_future(wait_for_network_idle(page, timeout=10, since=submitted)),
+        ]
+        done, pending = await asyncio.wait(waits, return_when=asyncio.FIRST_COMPLETED)
+        for w in pending:
+            w.cancel()
+        await asyncio.gather(*waits, return_exceptions=True)
+
+    async def _search_term(self, term: str) -> List[Dict]:
+        results: List[Dict] = []
+        timings = {}
+        started = mark = time.monotonic()
+
+        def lap(name):
+            nonlocal mark
+            now = time.monotonic()
+            timings[name] = round(now - mark, 3)
+            mark = now
+
+        cdp = CallCounter()
+        async with self.pool.tab(self.key, self._open_home, self.blocker, user_agent=random_ua(), locale="en-IN") as tab:
+            lap("tab")
+            page = cdp.wrap(tab)
+            blocked_before = dict(page._rb_blocked)
+
+            # Try to find and click search input
+            search_input = await wait_for_first(
+                page, as_list(self.sel["search_input"]), timeout=5000, fallback=self.sel["search_fallback"]
+            )
+            lap("input")
+
+            await page.evaluate(_MARK_STALE_JS, [", ".join(as_list(self.sel["product_card"])), STALE_ATTR])
+            submitted = time.monotonic()
+            await search_input.click()
+            await search_input.fill(term)
+            await page.keyboard.press("Enter")
+            lap("submit")
+
+            await self._wait_for_results(page, submitted)
+            lap("results")
+
+            # Extract every fresh card in one round trip, then filter in Python
+            for card in await extract_cards(page, self.sel, STALE_ATTR):
+                title = card["title"]
+                if not title or term.lower() not in title.lower():
+                    continue
+                href = card["href"]
+                url = (BASE_URL + href if href.startswith("/") else href) if href else ""
+                results.append({
+                    "id": url or title,
+                    "name": title,
+                    "price": card["price"],
+                    "in_stock": card["in_stock"],
+                    "url": url,
+                    "term": term
+                })
+            lap("extract")
+            blocked = page._rb_blocked["requests"] - blocked_before["requests"]
+            saved = page._rb_blocked["bytes_est"] - blocked_before["bytes_est"]
+
+        timings["total"] = round(time.monotonic() - started, 3)
+        timings["cdp_calls"] = cdp.calls
+        self.last_timings[term] = timings
+        for phase, seconds in timings.items():
+            if phase != "cdp_calls":
+                BROWSER_PHASE_SECONDS.observe(seconds, store="Swiggy", phase=phase)
+        logger.info(
+            f"Swiggy browser '{term}': " + ", ".join(f"{k}={v:.2f}s" for k, v in timings.items() if k != "cdp_calls")
+            + f", cdp calls={cdp.calls}, blocked={blocked} (~{saved // 1024} KB saved)"
+        )
+        return results
+
     async def search(self, terms: list[str]) -> List[Dict]:
         results: List[Dict] = []
-        ua = random_ua()
-        
-        try:
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(headless=True)
-                ctx = await browser.new_context(user_agent=ua, locale="en-IN")
-                page = await ctx.new_page()
-
-                # 1. Open Swiggy Instamart
-                await page.goto("https://www.swiggy.com/instamart", wait_until="domcontentloaded", timeout=30000)
-                await page.wait_for_timeout(2000)
-
-                # 2. Try to search for each term
-                for term in terms:
-                    try:
-                        # Try to find and click search input
-                        search_selectors = [
-                            "input[placeholder*='search']",
-                            "input[type='search']", 
-                            "input[name='search']",
-                            "[data-testid*='search']",
-                            "input"
-                        ]
-                        
-                        search_input = None
-                        for selector in search_selectors:
-                            try:
-                                search_input = await page.wait_for_selector(selector, timeout=5000)
-                                if search_input:
-                                    break
-                            except:
-                                continue
-                        
-                        if search_input:
-                            await search_input.click()
-                            await search_input.fill(term)
-                            await page.keyboard.press("Enter")
-                            await page.wait_for_timeout(3000)
-                            
-                            # Try to find products
-                            product_selectors = [
-                                "[data-testid*='product']",
-                                ".product-card",
-                                ".item-card", 
-                                ".product",
-                                "[class*='product']"
-                            ]
-                            
-                            for prod_selector in product_selectors:
-                                try:
-                                    cards = await page.query_selector_all(prod_selector)
-                                    if cards:
-                                        for card in cards[:5]:  # Limit to first 5 products
-                                            try:
-                                                # Try to get title
-                                                title_selectors = ["h3", "h4", ".product-title", ".item-title", "[class*='title']"]
-                                                title = ""
-                                                for title_sel in title_selectors:
-                                                    title_el = await card.query_selector(title_sel)
-                                                    if title_el:
-                                                        title = (await title_el.inner_text()).strip()
-                                                        if title:
-                                                            break
-                                                
-                                                if title and term.lower() in title.lower():
-                                                    # Check if in stock
-                                                    add_buttons = await card.query_selector_all("button")
-                                                    in_stock = len(add_buttons) > 0
-                                                    
-                                                    # Get price
-                                                    price_el = await card.query_selector("text=₹")
-                                                    price = (await price_el.inner_text()) if price_el else ""
-                                                    
-                                                    # Get URL
-                                                    link_el = await card.query_selector("a")
-                                                    url = ""
-                                                    if link_el:
-                                                        href = await link_el.get_attribute("href")
-                                                        if href:
-                                                            url = "https://www.swiggy.com" + href if href.startswith("/") else href
-                                                    
-                                                    results.append({
-                                                        "id": url or title,
-                                                        "name": title,
-                                                        "price": price,
-                                                        "in_stock": in_stock,
-                                                        "url": url
-                                                    })
-                                            except Exception as e:
-                                                continue
-                                        break
-                                except:
-                                    continue
-                    except Exception as e:
-                        continue
-
-                await browser.close()
-        except Exception as e:
-            # Return empty results if browser fails
-            pass
-            
+
+        # Terms run in parallel tabs, bounded by the pool's per-context tab limit
+        outcomes = await asyncio.gather(*(self._search_term(t) for t in terms), return_exceptions=True)
+
+        for term, outcome in zip(terms, outcomes):
+            if isinstance(outcome, asyncio.CancelledError):
+                raise outcome
+            if isinstance(outcome, BaseException):
+                logger.warning(f"Swiggy browser search for '{term}' failed: {outcome}")
+                continue
+            results.extend(outcome)
+
+        if outcomes and all(isinstance(o, BaseException) for o in outcomes):
+            # Start from a fresh context next time, and fail the check so the circuit breaker sees it
+            await self.pool.discard(self.key)
+            raise RuntimeError(f"Swiggy browser: all {len(terms)} search(es) failed, last: {outcomes[-1]}") from outcomes[-1]
+
         return results